@@ -1,3 +1,7 @@
+#Time measures startup and how long a streaming load takes
+import time
+MODULE_START = time.perf_counter()
+
 #ElementTree reads XML structure and parses <url> and <loc> tags
 import xml.etree.ElementTree as ET
 #RegularExpressions removes Numeric ID's
@@ -8,24 +12,142 @@ from urllib.parse import urlparse
 import sys
 #OS can join the file paths for any OS
 import os
+#Argparse reads the command line lookup options
+import argparse
+#Array records which old row each refreshed URL came from
+from array import array
+
+from interactionIndexCache import InteractionIndexCache
+from interactionMetrics import metrics
+from drugNameIndex import DrugNameIndex
+from compactInteractionStore import CompactInteractionStore, NO_DRUG, URL_PREFIX
+from interactionGraph import InteractionGraph
+
+#Every <url>, <sitemap> and <loc> tag lives in this namespace
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+#Numeric ID appended to each drug name in the URLs
+DRUG_ID_PATTERN = re.compile(r'-\d+(-\d+)*$')
+
+#urlparse treats these specially, URLs containing them take the slow path
+URL_HOST = 'https://www.drugs.com'
+URL_SPECIAL_CHARS = '?#;\t\r\n'
+
+#Make drug names lowercase and turn ' ' to hyphens
+#Module level so the query engine and graph normalize names exactly like the parser
+def normalize_drug_name(drug_name):
+    return drug_name.lower().strip().replace(' ', '-')
+
+
+#Removes the drug names from each URL
+#Returns a tuple for easy parsing, or None if the URL doesn't name two drugs
+#Module level so the knowledge base indexes can name drugs the same way
+def extract_drugs_from_url(url):
+    try:
+#Extract the path from URL
+#Plain drugs.com URLs skip urlparse, their path is everything after the host
+        if url.startswith(URL_PREFIX) and not any(char in url for char in URL_SPECIAL_CHARS):
+            path = url[len(URL_HOST):]
+        else:
+            path = urlparse(url).path
+        
+#Remove /drug-interactions/ and .html
+        path = path.replace('/drug-interactions/', '').replace('.html', '')
+        
+#-with- separates two drugs in the URLs
+#Remove that and split to a list
+        if '-with-' in path:
+            parts = path.split('-with-')
+            drug1_part = parts[0]
+            drug2_part = parts[1] if len(parts) > 1 else ''
+            
+#Removes the numeric ID applied to each
+            drug1 = DRUG_ID_PATTERN.sub('', drug1_part)
+            drug2 = DRUG_ID_PATTERN.sub('', drug2_part)
+
+#Exception handling for parsing
+            return (drug1, drug2)
+    except Exception as e:
+        print(f"Error parsing URL {url}: {e}")
+    
+    return None
 
-from interactionScraperHTML import DrugInteractionScraper
 
 #Gets the sitemap for the Interaction Website
 #Makes a library of searchable URLS
 class DrugInteractionParser:
-    def __init__(self, xml_file_path):
+    def __init__(self, xml_file_path, streaming=False, use_cache=True, rebuild_cache=False):
         
 #Get the directory, speeds up the searches
         script_dir = os.path.dirname(os.path.abspath(__file__))
         
 #Get the absolute path to the XML files
         self.xml_file_path = os.path.join(script_dir, xml_file_path)
-#Empty;ost to store each of the URLs
-        self.interactions = []
-        self.parse_xml()
+#Interned drug names and URL columns, indexed by unordered drug pair
+        self.store = CompactInteractionStore()
+#Drug name vocabulary for suggest(), built the first time it is needed
+#Held as (store, index) with the store it was built from
+        self.name_index = (None, None)
+#CSR drug graph for neighbor queries, built the first time it is needed, also (store, graph)
+        self.interaction_graph = (None, None)
+        self.streaming = streaming
+#Child sitemap files a sitemap index pointed to, their signatures go in the index cache
+        self.sitemap_children = []
+
+#Compiled index saved next to the XML so startup can skip parsing
+        self.index_cache = InteractionIndexCache(self.xml_file_path) if use_cache else None
+
+        if rebuild_cache or not self.load_cached_index():
+            self.load_xml()
+            self.save_index()
+
+#Parses the sitemap with whichever loader was chosen
+    def load_xml(self):
+#Streaming mode never holds the whole XML tree in memory
+        if self.streaming:
+            self.stream_xml()
+        else:
+            self.parse_xml()
+
+#Loads the compiled index if it still matches the XML file
+#Returns True if the XML doesn't need parsing
+    @metrics.timed('index_cache_load')
+    def load_cached_index(self):
+        if self.index_cache is None:
+            return False
+
+        data = self.index_cache.load(self.loader_mode())
+        if not isinstance(data, dict) or not isinstance(data.get('store'), CompactInteractionStore):
+            return False
+
+        self.store = data['store']
+        self.sitemap_children = data.get('children', [])
+        print(f"Loaded {len(self.interactions)} drug interaction entries from index cache.")
+        return True
+
+#Saves the parsed sitemap to the compiled index
+    def save_index(self):
+        if self.index_cache is None:
+            return
+        self.index_cache.save({'store': self.store, 'children': self.sitemap_children},
+                              self.loader_mode(), self.sitemap_children)
+
+#The tree parser doesn't follow sitemap indexes, so the two loaders can build different indexes
+    def loader_mode(self):
+        return 'streaming' if self.streaming else 'tree'
+
+#Reparses the XML and replaces the compiled index
+    def rebuild_index(self):
+        self.store = CompactInteractionStore()
+        self.load_xml()
+        self.save_index()
+
+#Every sitemap URL in order, rebuilt from the compact store when read
+    @property
+    def interactions(self):
+        return self.store.urls()
 
 #Pulls all of the URLs out of the XML file
+    @metrics.timed('xml_load')
     def parse_xml(self):
 
 #Removes the root to each URL then saves it
@@ -36,9 +158,15 @@ class DrugInteractionParser:
             namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
             
 #Moves the URLs to the List
-            for url in root.findall('ns:url/ns:loc', namespace):
-                self.interactions.append(url.text)
+#Timed as one stage, a timer per URL would cost more than indexing it
+            with metrics.timer('index_build'):
+#An empty <loc/> names no page, so it is skipped rather than stored
+                for url in root.findall('ns:url/ns:loc', namespace):
+                    if url.text and url.text.strip():
+                        self.index_url(url.text)
+                self.store.finalize()
             
+            metrics.increment('entries_loaded', len(self.interactions))
             print(f"Loaded {len(self.interactions)} drug interaction entries from XML file.")
 
 #Exception handling for parsing the filepath
@@ -49,62 +177,267 @@ class DrugInteractionParser:
             print(f"Error: File '{self.xml_file_path}' not found.")
             sys.exit(1)
 
+#Streams the sitemap with iterparse instead of building the whole tree
+#Returns the number of entries loaded and the seconds it took
+    @metrics.timed('xml_load')
+    def stream_xml(self):
+        start = time.perf_counter()
+        try:
+            self.sitemap_children = []
+#Streaming interleaves reading the XML with indexing, so the stage covers both
+            with metrics.timer('index_build'):
+                count = self.stream_sitemap(self.xml_file_path)
+                self.store.finalize()
+
+#Same exception handling as parse_xml
+        except ET.ParseError as e:
+            print(f"Error parsing XML file: {e}")
+            sys.exit(1)
+        except FileNotFoundError as e:
+            print(f"Error: File '{e.filename}' not found.")
+            sys.exit(1)
+
+        elapsed = time.perf_counter() - start
+        metrics.increment('entries_loaded', count)
+        print(f"Streamed {count} drug interaction entries from XML file in {elapsed:.2f}s.")
+        return count, elapsed
+
+#Loads one sitemap file, following a sitemap index into its children
+    def stream_sitemap(self, path):
+        count = 0
+        for url in self.iter_sitemap_urls(path, self.sitemap_children):
+            self.index_url(url)
+            count += 1
+        return count
+
+#Yields every interaction URL in a sitemap without keeping the tree
+#Child sitemap paths are added to children, if given
+    def iter_sitemap_urls(self, path, children=None):
+        child_sitemaps = []
+
+        with self.open_sitemap(path) as f:
+            context = ET.iterparse(f, events=('start', 'end'))
+
+#The first event is the root, which tells us urlset or sitemapindex
+            _, root = next(context)
+            is_index = root.tag == SITEMAP_NS + 'sitemapindex'
+
+            for event, elem in context:
+                if event != 'end':
+                    continue
+
+#Each <loc> is an interaction URL, or a child sitemap inside an index
+                if elem.tag == SITEMAP_NS + 'loc':
+#Empty <loc/> entries are skipped, like parse_xml does
+                    if not (elem.text and elem.text.strip()):
+                        continue
+                    if is_index:
+                        child_sitemaps.append(elem.text.strip())
+                    else:
+                        yield elem.text
+
+#Clear finished entries so memory stays flat as the sitemap grows
+                elif elem.tag in (SITEMAP_NS + 'url', SITEMAP_NS + 'sitemap'):
+                    root.clear()
+
+        for child in child_sitemaps:
+            child_path = self.resolve_child_sitemap(path, child)
+            if children is not None:
+                children.append(child_path)
+            yield from self.iter_sitemap_urls(child_path, children)
+
+#Opens plain XML, or gzip if the file starts with the gzip magic bytes
+    def open_sitemap(self, path):
+        with open(path, 'rb') as f:
+            magic = f.read(2)
+        if magic == b'\x1f\x8b':
+            import gzip
+            return gzip.open(path, 'rb')
+        return open(path, 'rb')
+
+#Sitemap indexes list child sitemaps by URL
+#Look for the downloaded copy next to the index file
+    def resolve_child_sitemap(self, index_path, loc):
+        if loc.startswith(('http://', 'https://')):
+            loc = os.path.basename(urlparse(loc).path)
+        return os.path.join(os.path.dirname(index_path), loc)
+
+#Applies a new version of the sitemap without a full reload
+#Each URL is matched against the rows of its own drug pair, so only added URLs are encoded,
+#kept rows are copied over in the new sitemap order. The new store is the same one a fresh
+#load would build, and replaces the old one in a single assignment, so lookups running
+#meanwhile keep answering from the old store and never wait
+#Returns a summary of what changed
+    def refresh(self, xml_file_path=None):
+        start = time.perf_counter()
+        if xml_file_path:
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+            xml_file_path = os.path.join(script_dir, xml_file_path)
+        else:
+            xml_file_path = self.xml_file_path
+
+        old_store = self.store
+        matched = bytearray(len(old_store))
+#Old row of every URL in the new sitemap, -1 for added ones
+        sources = array('i')
+        added = []
+        children = []
+
+        try:
+            for url in self.iter_sitemap_urls(xml_file_path, children):
+                drugs = self.extract_drugs_from_url(url)
+                row = old_store.find_row(url, drugs, matched)
+                if row is None:
+                    added.append((url, drugs))
+                    sources.append(-1)
+                else:
+                    matched[row] = 1
+                    sources.append(row)
+        except (ET.ParseError, FileNotFoundError) as e:
+            print(f"Error refreshing from '{xml_file_path}': {e}")
+            return None
+
+#bytearray.find jumps straight to the unmatched rows
+        removed_rows = []
+        row = matched.find(0)
+        while row != -1:
+            removed_rows.append(row)
+            row = matched.find(0, row + 1)
+        removed_urls = [old_store.url(row) for row in removed_rows]
+
+        new_store = old_store.refreshed(sources, added)
+        new_store.finalize()
+
+#Swap everything readers use in one go
+#The name index and graph are tied to the store they were built from, so they rebuild on next use
+        self.store = new_store
+        self.sitemap_children = children
+        if xml_file_path != self.xml_file_path:
+            self.xml_file_path = xml_file_path
+            if self.index_cache is not None:
+                self.index_cache = InteractionIndexCache(xml_file_path)
+        self.save_index()
+
+#Only pairs touched by a changed URL can have appeared or gone
+        added_pairs = {tuple(sorted(drugs)) for _, drugs in added
+                       if drugs and not old_store.has_pair(*drugs)}
+        removed_pairs = set()
+        for row in removed_rows:
+            if old_store.drug1[row] != NO_DRUG:
+                pair = (old_store.names[old_store.drug1[row]], old_store.names[old_store.drug2[row]])
+                if not new_store.has_pair(*pair):
+                    removed_pairs.add(tuple(sorted(pair)))
+
+        summary = {
+            'added': len(added),
+            'removed': len(removed_rows),
+            'unchanged': len(old_store) - len(removed_rows),
+            'added_urls': [url for url, _ in added],
+            'removed_urls': removed_urls,
+            'added_pairs': sorted(added_pairs),
+            'removed_pairs': sorted(removed_pairs),
+            'elapsed': time.perf_counter() - start,
+        }
+        print(f"Refreshed sitemap: {summary['added']} added, {summary['removed']} removed, "
+              f"{summary['unchanged']} unchanged in {summary['elapsed']:.2f}s.")
+        return summary
+
+#Adds one URL and its drug pair to the store, keeping sitemap order
+#The store is searchable once finalize() sorts the pairs
+    def index_url(self, url):
+        self.store.add(url, self.extract_drugs_from_url(url))
+
+#Name index of the current store, built on first use and again after a refresh
+#The index is kept with the store it was built from, so one built while
+#refresh() swapped stores is never used with the new store
+    def suggestion_index(self):
+        store = self.store
+        indexed_store, name_index = self.name_index
+        if indexed_store is not store:
+            name_index = DrugNameIndex(store.live_names())
+            self.name_index = (store, name_index)
+        return name_index
+
+#Suggests up to k known drug names for what the user has typed so far
+#Prefix completions come first, then close spellings
+    def suggest(self, drug_name, k=10):
+        return self.suggestion_index().suggest(self.normalize_drug_name(drug_name), k)
+
+#Drug-drug graph of every pair in the sitemap
+#Kept with its store like the name index
+    def graph(self):
+        store = self.store
+        graph_store, interaction_graph = self.interaction_graph
+        if graph_store is not store:
+            interaction_graph = InteractionGraph.from_store(store)
+            self.interaction_graph = (store, interaction_graph)
+        return interaction_graph
+
+#Every drug that has an interaction page with this one, without scanning the URLs
+    def interactions_for(self, drug_name):
+        return self.graph().interactions_for(self.normalize_drug_name(drug_name))
+
 #Make drug names lowercase and turn ' ' to hyphens
 #Returns the drug name as a string
     def normalize_drug_name(self, drug_name):
-        return drug_name.lower().strip().replace(' ', '-')
+        return normalize_drug_name(drug_name)
 
 #Removes the drug names from each URL
 #Returns a tuple for easy parsing
     def extract_drugs_from_url(self, url):
-        try:
-#Extract the path from URL
-            path = urlparse(url).path
-            
-#Remove /drug-interactions/ and .html
-            path = path.replace('/drug-interactions/', '').replace('.html', '')
-            
-#-with- separates two drugs in the URLs
-#Remove that and split to a list
-            if '-with-' in path:
-                parts = path.split('-with-')
-                drug1_part = parts[0]
-                drug2_part = parts[1] if len(parts) > 1 else ''
-                
-#Removes the numeric ID applied to each
-                drug1 = re.sub(r'-\d+(-\d+)*$', '', drug1_part)
-                drug2 = re.sub(r'-\d+(-\d+)*$', '', drug2_part)
-
-#Exception handling for parsing
-                return (drug1, drug2)
-        except Exception as e:
-            print(f"Error parsing URL {url}: {e}")
-        
-        return None
+        return extract_drugs_from_url(url)
 
 #Searches the two drugs to find any listed interaction
 #Returns URL if exists, nothing if not
+    @metrics.timed('lookup')
     def check_interaction(self, drug1, drug2):
 #Normalize both drug inputs from user
         drug1_norm = self.normalize_drug_name(drug1)
         drug2_norm = self.normalize_drug_name(drug2)
 
-#Set a list for the URLs
-        matching_urls = []
+#The store's pair key matches both drug orders
+        return self.store.lookup(drug1_norm, drug2_norm)
 
-#Loop through URL Directory to make the search O(1) time
-        for url in self.interactions:
-            drugs = self.extract_drugs_from_url(url)
-            
-            if drugs:
-                url_drug1, url_drug2 = drugs
-                
-#Reorder drugs then try search again
-                if ((drug1_norm == url_drug1 and drug2_norm == url_drug2) or
-                    (drug2_norm == url_drug1 and drug1_norm == url_drug2)):
-                    matching_urls.append(url)
-        
-        return matching_urls
+#True if the URL is one of the sitemap's interaction pages
+    def is_sitemap_url(self, url):
+        store = self.store
+        drugs = self.extract_drugs_from_url(url)
+        if drugs and url in store.lookup(*drugs):
+            return True
+        return url in store.irregular.values()
+
+#Checks every pair in a patient's medication list
+#Returns a dictionary of found interactions without printing anything
+    @metrics.timed('regimen_check')
+    def check_regimen(self, drugs):
+#Normalize each name once, skipping repeats of the same drug
+#Read the store once so a refresh() mid-check can't mix two versions
+        store = self.store
+        regimen = []
+        seen = set()
+        for drug in drugs:
+            drug_norm = self.normalize_drug_name(drug)
+            if drug_norm and drug_norm not in seen:
+                seen.add(drug_norm)
+                regimen.append((drug, store.name_ids.get(drug_norm)))
+
+#Look up every unordered pair of known drugs against the index
+        interactions = []
+        for i, (drug1, drug1_id) in enumerate(regimen):
+            if drug1_id is None:
+                continue
+            for drug2, drug2_id in regimen[i + 1:]:
+                if drug2_id is None:
+                    continue
+                rows = store.rows_for_ids(drug1_id, drug2_id)
+                if rows:
+                    interactions.append({'drug1': drug1, 'drug2': drug2, 'urls': [store.url(row) for row in rows]})
+
+        return {
+            'drugs': [drug for drug, _ in regimen],
+            'pairs_checked': len(regimen) * (len(regimen) - 1) // 2,
+            'interactions': interactions,
+        }
 
 #Searches interactions that do exist from the HTM results
 #From the list, checks if the interactions were found
@@ -128,57 +461,58 @@ class DrugInteractionParser:
             print("Note: This doesn't guarantee safety - always consult a healthcare professional.")
             return []
 
-#main() to run the drug intraction checks
+#Command line lookup: python InteractionXMLParser.py warfarin aspirin [--scrape]
+#requests and bs4 are only imported when --scrape is given,
+#so a lookup against the compiled index starts in a few tens of milliseconds
 def main():
-    
-    # Manually set the XML file name
-    xml_file = "drug-interactions.xml" 
-    
-    # Manually set the two drugs
-    drug1 = "acebutolol"
-    drug2 = "taurine"
-    
-    # No command-line argument check is needed
-    
-    # Create parser and check interaction
-    parser = DrugInteractionParser(xml_file)
-    results = parser.search_drug_interactions(drug1, drug2)
+    arg_parser = argparse.ArgumentParser(description="Check two drugs against the drugs.com interaction sitemap.")
+    arg_parser.add_argument('drug1')
+    arg_parser.add_argument('drug2')
+    arg_parser.add_argument('--xml', default='drug-interactions.xml', help="sitemap XML file")
+    arg_parser.add_argument('--streaming', action='store_true', help="load the sitemap with iterparse")
+    arg_parser.add_argument('--rebuild-cache', action='store_true', help="reparse the XML even if the index is current")
+    arg_parser.add_argument('--scrape', action='store_true', help="scrape the first interaction page found")
+    arg_parser.add_argument('--output', default='interaction_data.json',
+                            help="where --scrape saves the page, .jsonl, .ndjson, .msgpack and .mpk files are appended to")
+    arg_parser.add_argument('--offline', action='store_true', help="only scrape pages already in the HTTP cache")
+    arg_parser.add_argument('--timing', action='store_true', help="report how long startup and the lookup took")
+    args = arg_parser.parse_args()
 
-    if results and len(results) > 0:
+    imported = time.perf_counter()
+    parser = DrugInteractionParser(args.xml, streaming=args.streaming, rebuild_cache=args.rebuild_cache)
+    loaded = time.perf_counter()
+    results = parser.search_drug_interactions(args.drug1, args.drug2)
+    looked_up = time.perf_counter()
+
+    if args.timing:
+        print(f"\nStartup timing (after interpreter start):")
+        print(f"  imports:    {(imported - MODULE_START) * 1000:.1f} ms")
+        print(f"  index load: {(loaded - imported) * 1000:.1f} ms")
+        print(f"  lookup:     {(looked_up - loaded) * 1000:.1f} ms")
+        print(f"  total:      {(looked_up - MODULE_START) * 1000:.1f} ms")
+
+    if args.scrape and results:
+#Imported here so lookup-only runs never load requests and bs4
+        from interactionScraperHTML import DrugInteractionScraper
+        from httpCache import HTTPCache
+        from interactionOutput import RECORD_EXTENSIONS
 
 #Use the first URL found
-        url = results[0]
-# Create scraper instance and get detailed info
-        scraper = DrugInteractionScraper(url)
+        cache = HTTPCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.http_cache'),
+                          offline=args.offline)
+        scraper = DrugInteractionScraper(results[0], cache=cache)
         data = scraper.scrape_all()
         if data:
             scraper.print_summary()
-            scraper.save_to_json('interaction_data.json')
+            if args.output.endswith(RECORD_EXTENSIONS):
+                scraper.save_to_jsonl(args.output)
+            else:
+                scraper.save_to_json(args.output)
             print("\n Detailed interaction data saved successfully!")
-
         else:
             print("\n Could not scrape detailed information from URL")
+            sys.exit(1)
 
 
-
-#This is the code we'll use when running this program
-#Right now it is set to Hard Code each drug into the system
-    """
-    #Check command line arguments
-    if len(sys.argv) != 4:
-        print("Usage: python drug_interaction_parser.py <xml_file> <drug1> <drug2>")
-        print("\nExample:")
-        print("  python drug_interaction_parser.py interactions.xml \"warfarin\" \"aspirin\"")
-        sys.exit(1)
-    
-    xml_file = sys.argv[1]
-    drug1 = sys.argv[2]
-    drug2 = sys.argv[3]
-    
-    #Create parser and check interaction
-    parser = DrugInteractionParser(xml_file)
-    parser.search_drug_interactions(drug1, drug2)
-"""
-
 if __name__ == "__main__":
     main()
@@ -0,0 +1,315 @@
+#Argparse reads the benchmark options
+import argparse
+#Contextlib silences the parser's progress prints while timing
+import contextlib
+#HTML escapes fixture text when building a synthetic page
+import html
+#JSON writes results so runs can be compared
+import json
+#OS and tempfile hold the generated sitemaps
+import os
+import tempfile
+#Platform records where the numbers came from
+import platform
+#Random generates repeatable synthetic data
+import random
+#Time measures every hot path
+import time
+#System provides the exit code when a refresh check fails
+import sys
+
+from InteractionXMLParser import DrugInteractionParser
+
+
+#Directory of this script, used to find the bundled interaction_data.json
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+#Writes a synthetic sitemap with n drugs.com style -with- URLs
+#The same seed always produces the same file
+def generate_sitemap(path, n, seed=0):
+    rng = random.Random(seed)
+#Roughly sqrt(n) drugs keeps the pair graph realistically sparse
+    vocabulary = max(50, int(n ** 0.5) * 4)
+    drugs = [(f"drug{i}", f"{i}-0") for i in range(vocabulary)]
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for _ in range(n):
+            (name1, id1), (name2, id2) = rng.sample(drugs, 2)
+            f.write(f'<url><loc>https://www.drugs.com/drug-interactions/'
+                    f'{name1}-{id1}-with-{name2}-{id2}.html</loc></url>\n')
+        f.write('</urlset>\n')
+    return [name for name, _ in drugs]
+
+
+#Nearest-rank percentile of an already sorted list
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+#Times loading the sitemap with each loader and from the index cache
+def bench_load(path):
+    results = {}
+    with contextlib.redirect_stdout(None):
+        start = time.perf_counter()
+        DrugInteractionParser(path, use_cache=False)
+        results['parse_xml_s'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        DrugInteractionParser(path, streaming=True, use_cache=False)
+        results['stream_xml_s'] = time.perf_counter() - start
+
+        DrugInteractionParser(path, rebuild_cache=True)
+        start = time.perf_counter()
+        parser = DrugInteractionParser(path)
+        results['cached_load_s'] = time.perf_counter() - start
+    return parser, results
+
+
+#Times single-pair lookups, half of which exist in the sitemap
+def bench_lookup(parser, drugs, queries=20000, seed=1):
+    rng = random.Random(seed)
+    known_pairs = [pair for pair, _ in zip(parser.store.pairs(), range(queries // 2))]
+    pairs = known_pairs + [tuple(rng.sample(drugs, 2)) for _ in range(queries - len(known_pairs))]
+    rng.shuffle(pairs)
+
+    timings = []
+    for drug1, drug2 in pairs:
+        start = time.perf_counter_ns()
+        parser.check_interaction(drug1, drug2)
+        timings.append(time.perf_counter_ns() - start)
+
+    timings.sort()
+    return {
+        'queries': len(timings),
+        'p50_us': percentile(timings, 0.50) / 1000,
+        'p99_us': percentile(timings, 0.99) / 1000,
+        'mean_us': sum(timings) / len(timings) / 1000,
+    }
+
+
+#Times check_regimen over random ten-drug regimens
+def bench_batch(parser, drugs, regimens=5000, regimen_size=10, seed=2):
+    rng = random.Random(seed)
+    batch = [rng.sample(drugs, regimen_size) for _ in range(regimens)]
+
+    start = time.perf_counter()
+    for regimen in batch:
+        parser.check_regimen(regimen)
+    elapsed = time.perf_counter() - start
+    return {
+        'regimens': regimens,
+        'regimen_size': regimen_size,
+        'elapsed_s': elapsed,
+        'regimens_per_s': regimens / elapsed,
+    }
+
+
+#Times refresh() onto a copy of the sitemap with 1% of URLs dropped, 1% added and some moved
+#The refreshed index must be exactly what a fresh load of the new file builds, order included
+def bench_refresh(parser, path, seed=3):
+    rng = random.Random(seed)
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()
+    head, entries, tail = lines[:2], lines[2:-1], lines[-1:]
+    step = max(1, len(entries) // 100)
+    changed = [line for position, line in enumerate(entries) if position % step]
+    for position in range(0, len(entries), step):
+        changed.insert(rng.randrange(len(changed) + 1),
+                       f'<url><loc>https://www.drugs.com/drug-interactions/'
+                       f'newdrug{position}-1-0-with-drug{position % 50}-{position % 50}-0.html</loc></url>\n')
+    for _ in range(step):
+        changed.insert(rng.randrange(len(changed) + 1), changed.pop(rng.randrange(len(changed))))
+
+    changed_path = path.replace('.xml', '-changed.xml')
+    with open(changed_path, 'w', encoding='utf-8') as f:
+        f.writelines(head + changed + tail)
+
+    with contextlib.redirect_stdout(None):
+        start = time.perf_counter()
+        summary = parser.refresh(changed_path)
+        elapsed = time.perf_counter() - start
+        fresh = DrugInteractionParser(changed_path, use_cache=False)
+    matches = (list(parser.interactions) == list(fresh.interactions)
+               and parser.store.pair_keys == fresh.store.pair_keys
+               and parser.store.pair_rows == fresh.store.pair_rows
+               and parser.store.names == fresh.store.names)
+    if not matches:
+        print(f"Refreshed index of {path} differs from a fresh load of the same sitemap")
+    return {
+        'added': summary['added'],
+        'removed': summary['removed'],
+        'elapsed_s': elapsed,
+        'matches_fresh_load': matches,
+    }
+
+
+#Builds a drugs.com style page from the bundled interaction_data.json
+#Used when no saved HTML fixtures are given
+def synthetic_fixture():
+    with open(os.path.join(SCRIPT_DIR, 'interaction_data.json'), encoding='utf-8') as f:
+        data = json.load(f)
+    paragraphs = ''.join(f'<p>{html.escape(text)}</p>' for text in data.get('description', []))
+    return data['url'], (
+        '<html><body><main id="content">'
+        '<h1>Acebutolol and Taurine Interactions</h1>'
+        '<div class="interaction-severity">Moderate Drug Interaction</div>'
+        f'<div class="interactions-reference">{paragraphs}</div>'
+        '</main></body></html>'
+    )
+
+
+#Loads every .html file in a directory as (url, html) fixtures
+def load_fixtures(fixture_dir):
+    fixtures = []
+    for name in sorted(os.listdir(fixture_dir)):
+        if name.endswith(('.html', '.htm')):
+            with open(os.path.join(fixture_dir, name), encoding='utf-8') as f:
+                fixtures.append((f"https://www.drugs.com/drug-interactions/{name}", f.read()))
+    return fixtures
+
+
+#Times parse + extraction per page for each extractor and parser backend
+#The network is left out so only the CPU work is measured
+def bench_extraction(fixtures, min_pages=200):
+#Imported here so lookup-only runs don't need requests and bs4
+    from interactionScraperHTML import DrugInteractionScraper
+
+#Repeat small fixture sets so every timing covers enough pages
+    rounds = max(1, -(-min_pages // len(fixtures)))
+
+    results = {}
+    for backend in ('html.parser', 'lxml'):
+        for method in ('extract_all', 'extract_single_pass'):
+            start = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(None):
+                    for _ in range(rounds):
+                        for url, html_content in fixtures:
+                            scraper = DrugInteractionScraper(url, parser=backend)
+                            scraper.load_html(html_content)
+                            getattr(scraper, method)()
+            except Exception as e:
+                results[f'{backend}/{method}'] = {'error': str(e)}
+                continue
+            pages = rounds * len(fixtures)
+            elapsed = time.perf_counter() - start
+            results[f'{backend}/{method}'] = {
+                'pages': pages,
+                'ms_per_page': elapsed / pages * 1000,
+                'pages_per_s': pages / elapsed,
+            }
+    return results
+
+
+#1, 2, 4... workers, ending at the CPU count
+def default_worker_counts():
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 < cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+
+#Throughput of BulkExtractor at each worker count, to check it scales close to linearly
+#Pages are handed over already read, like a tar corpus, so disk speed stays out of it
+def bench_scaling(fixtures, worker_counts, min_pages=400):
+#Imported here so lookup-only runs don't need bs4
+    from bulkExtract import BulkExtractor
+
+    rounds = max(1, -(-min_pages // len(fixtures)))
+    pages = [(f"{index}-{url.rsplit('/', 1)[1]}", None, html_content.encode('utf-8'))
+             for index in range(rounds) for url, html_content in fixtures]
+
+    results = {'cpus': os.cpu_count()}
+    baseline = None
+    for workers in worker_counts:
+        extractor = BulkExtractor(max_workers=workers)
+        for _ in extractor.extract_many(pages):
+            pass
+        pages_per_s = extractor.pages_per_second()
+        baseline = baseline or pages_per_s
+        speedup = pages_per_s / baseline if baseline else 0.0
+        results[str(workers)] = {
+            'pages': len(pages),
+            'pages_per_s': pages_per_s,
+            'speedup': speedup,
+#1.0 is perfectly linear, well below it means workers are waiting on each other or the machine
+            'efficiency': speedup / workers * worker_counts[0],
+        }
+    return results
+
+
+#Prints how each timing moved against a previous results file
+def compare(previous, current, prefix=''):
+    for key, value in current.items():
+        old = previous.get(key) if isinstance(previous, dict) else None
+        if isinstance(value, dict):
+            compare(old or {}, value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+            print(f"{prefix}{key}: {old:.4g} -> {value:.4g} ({value / old:.2f}x)")
+
+
+#Run the benchmark suite and save the results as JSON
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark sitemap load, lookup and extraction.")
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help="sitemap sizes to generate")
+    arg_parser.add_argument('--fixtures', help="directory of saved interaction .html pages")
+    arg_parser.add_argument('--output', default='benchmark_results.json')
+    arg_parser.add_argument('--compare', help="previous results file to compare against")
+    arg_parser.add_argument('--skip-extraction', action='store_true')
+    arg_parser.add_argument('--workers', type=int, nargs='+',
+                            help="bulk extraction worker counts to compare, defaults to 1, 2, 4... up to the CPU count")
+    args = arg_parser.parse_args()
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sitemaps': {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            print(f"Benchmarking {size} entry sitemap...")
+            path = os.path.join(workdir, f"sitemap-{size}.xml")
+            drugs = generate_sitemap(path, size)
+            parser, load_results = bench_load(path)
+            results['sitemaps'][str(size)] = {
+                'load': load_results,
+                'lookup': bench_lookup(parser, drugs),
+                'batch': bench_batch(parser, drugs),
+                'refresh': bench_refresh(parser, path),
+            }
+            del parser
+
+    if not args.skip_extraction:
+        print("Benchmarking extraction...")
+        fixtures = load_fixtures(args.fixtures) if args.fixtures else [synthetic_fixture()]
+        results['extraction'] = bench_extraction(fixtures)
+        print("Benchmarking bulk extraction scaling...")
+        results['scaling'] = bench_scaling(fixtures, args.workers or default_worker_counts())
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        print(f"\nCompared with {args.compare}:")
+        compare(previous, results)
+
+    if not all(sitemap['refresh']['matches_fresh_load'] for sitemap in results['sitemaps'].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
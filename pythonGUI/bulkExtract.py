@@ -0,0 +1,189 @@
+#Futures spreads page parsing over several processes
+from concurrent.futures import ProcessPoolExecutor
+#Deque keeps the submitted chunks in corpus order
+from collections import deque
+#Tarfile reads saved pages straight out of a .tar/.tar.gz archive
+import tarfile
+#Time measures throughput
+import time
+#Argparse reads the bulk extraction options
+import argparse
+#System provides the exit code for errors
+import sys
+#OS walks the corpus directory and counts the cores
+import os
+
+from interactionScraperHTML import DrugInteractionScraper
+from extractionCache import ExtractionCache
+from interactionOutput import RecordWriter
+from compactInteractionStore import URL_PREFIX
+
+
+#Saved pages are named after their drugs.com URL, see url_for_file()
+HTML_EXTENSIONS = ('.html', '.htm')
+
+#Each worker process opens its own connection to the memo file
+worker_extraction_cache = None
+
+
+#Runs once in every worker process before it takes any pages
+def init_worker(memo_path):
+    global worker_extraction_cache
+    if memo_path:
+        worker_extraction_cache = ExtractionCache(max_entries=1000, path=memo_path)
+
+
+#Rebuilds the interaction URL from a saved page's file name
+def url_for_file(name):
+    return URL_PREFIX + os.path.basename(name)
+
+
+#Yields (name, path, content) for every saved page in a directory or tar archive
+#Directory pages are read by the worker, tar pages are read here since only
+#one process can walk the archive
+def iter_corpus(source):
+    if os.path.isdir(source):
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(HTML_EXTENSIONS):
+                    yield filename, os.path.join(dirpath, filename), None
+        return
+
+#Stream mode reads the archive front to back without seeking, gzip or not
+    with tarfile.open(source, 'r|*') as archive:
+        for member in archive:
+            if member.isfile() and member.name.endswith(HTML_EXTENSIONS):
+                yield member.name, None, archive.extractfile(member).read()
+
+
+#Parses one saved page with the same extraction logic as a live scrape
+#Runs inside a worker process, so it must stay a top level function
+def extract_page(name, path, content, parser):
+    if content is None:
+        with open(path, 'rb') as f:
+            content = f.read()
+
+    scraper = DrugInteractionScraper(url_for_file(name), parser=parser, extraction_cache=worker_extraction_cache)
+    scraper.load_html(content.decode('utf-8', errors='replace'))
+    return scraper.extract_single_pass()
+
+
+#Extracts a whole chunk of pages so each trip to a worker carries enough work
+#A page that fails is reported back instead of stopping the chunk
+def extract_chunk(chunk, parser):
+    results = []
+    for name, path, content in chunk:
+        try:
+            results.append((name, extract_page(name, path, content, parser), None))
+        except Exception as e:
+            results.append((name, None, f"{type(e).__name__}: {e}"))
+#Worker processes are never told they are finishing, so each chunk's memo entries are written now
+    if worker_extraction_cache:
+        worker_extraction_cache.flush()
+    return results
+
+
+#Extracts a saved HTML corpus across a pool of processes
+#BeautifulSoup parsing is CPU bound and holds the GIL, so threads can't spread it
+class BulkExtractor:
+    def __init__(self, max_workers=None, chunk_size=16, parser='html.parser', memo_path=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+#BeautifulSoup backend used in every worker
+        self.parser = parser
+#Optional ExtractionCache file, pages unchanged since an earlier run skip parsing
+        self.memo_path = memo_path
+        self.pages_extracted = 0
+        self.failures = 0
+        self.elapsed = 0.0
+
+#Yields (name, data, error) for every page, in corpus order
+#Only a few chunks per worker are in flight so big archives never sit in memory
+    def extract_many(self, pages):
+        start = time.perf_counter()
+        pending = deque()
+        max_pending = self.max_workers * 2
+
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_worker,
+                                 initargs=(self.memo_path,)) as pool:
+            for chunk in self.chunks(pages):
+                pending.append(pool.submit(extract_chunk, chunk, self.parser))
+                if len(pending) >= max_pending:
+                    yield from self.collect(pending.popleft())
+            while pending:
+                yield from self.collect(pending.popleft())
+
+        self.elapsed = time.perf_counter() - start
+
+    def chunks(self, pages):
+        chunk = []
+        for page in pages:
+            chunk.append(page)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def collect(self, future):
+        for name, data, error in future.result():
+            if error:
+                self.failures += 1
+            else:
+                self.pages_extracted += 1
+            yield name, data, error
+
+    def pages_per_second(self):
+        if not self.elapsed:
+            return 0.0
+        return (self.pages_extracted + self.failures) / self.elapsed
+
+    def print_summary(self):
+        print("\n" + "=" * 70)
+        print("BULK EXTRACTION SUMMARY")
+        print("=" * 70)
+        print(f"Workers: {self.max_workers}, chunk size: {self.chunk_size}, parser: {self.parser}")
+        print(f"Pages extracted: {self.pages_extracted}")
+        print(f"Failed pages: {self.failures}")
+        print(f"Elapsed: {self.elapsed:.2f}s ({self.pages_per_second():.1f} pages/s)")
+        print("=" * 70)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Extract interaction records from saved HTML pages.")
+    arg_parser.add_argument('source', help="directory of saved pages, or a .tar/.tar.gz archive of them")
+    arg_parser.add_argument('output_file', nargs='?', default='interactions.jsonl',
+                            help="JSON lines (or .msgpack) file the records are written to")
+    arg_parser.add_argument('max_workers', nargs='?', type=int, help="worker processes, defaults to the CPU count")
+    arg_parser.add_argument('--lxml', action='store_true', help="parse with lxml instead of html.parser")
+    arg_parser.add_argument('--memo', action='store_true',
+                            help="memoize extractions so a rerun over the same pages skips parsing them")
+    args = arg_parser.parse_args()
+
+    source = args.source
+    output_file = args.output_file
+    if not os.path.exists(source):
+        print(f"Error: '{source}' not found.")
+        sys.exit(1)
+
+#--memo keeps extractions next to this script
+    memo_path = None
+    if args.memo:
+        memo_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.extraction_cache.db')
+    extractor = BulkExtractor(max_workers=args.max_workers, parser='lxml' if args.lxml else 'html.parser',
+                              memo_path=memo_path)
+#Records stream to <output_file>.partial as they finish, renamed into place at the end
+    with RecordWriter(output_file) as writer:
+        for name, data, error in extractor.extract_many(iter_corpus(source)):
+            if error:
+                print(f" Error extracting {name}: {error}")
+                continue
+            writer.write(data)
+
+    extractor.print_summary()
+    print(f"Results saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#Requests keeps one pooled session open for every page
+import requests
+from requests.adapters import HTTPAdapter
+#Futures runs a bounded number of fetches at the same time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+#Itertools takes the next few URLs off the list as workers free up
+import itertools
+#URLLibrary finds the host each URL belongs to
+from urllib.parse import urlparse
+#Threading guards the per-host rate limit between workers
+import threading
+#Time handles rate limits, backoff and throughput
+import time
+#Argparse reads the bulk scrape options
+import argparse
+#System provides the exit code for errors
+import sys
+#OS finds the cache directory next to this script
+import os
+
+from interactionScraperHTML import DrugInteractionScraper, HEADERS
+from httpCache import HTTPCache
+from extractionCache import ExtractionCache
+from interactionMetrics import metrics
+from interactionOutput import RecordWriter
+from fetchScheduler import BATCH, RETRY_STATUSES
+
+
+#Scrapes many interaction URLs over one pooled connection session
+#Each page still goes through the DrugInteractionScraper extract_* methods
+class BulkScraper:
+    def __init__(self, max_workers=8, requests_per_second=2.0, max_retries=3,
+                 backoff=0.5, timeout=10, cache=None, parser='html.parser', scheduler=None,
+                 extraction_cache=None):
+        self.max_workers = max_workers
+#BeautifulSoup backend handed to every DrugInteractionScraper
+        self.parser = parser
+#Optional HTTPCache checked before any request goes out
+        self.cache = cache
+#Optional FetchScheduler shared with interactive lookups, which then go first
+        self.scheduler = scheduler
+#Optional ExtractionCache so pages that haven't changed aren't parsed again
+        self.extraction_cache = extraction_cache
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+#Minimum gap between two requests to the same host
+        self.host_interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.host_next_request = {}
+        self.host_lock = threading.Lock()
+
+#One pool slot per worker so connections are reused, not reopened
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.stats = {'pages': 0, 'failures': 0, 'retries': 0, 'bytes': 0, 'elapsed': 0.0}
+        self.stats_lock = threading.Lock()
+
+#Waits until this host's next request slot is free
+#Slots are reserved under the lock, the sleep happens outside it
+    def wait_for_host(self, url):
+        if not self.host_interval:
+            return
+        host = urlparse(url).netloc
+        with self.host_lock:
+            now = time.monotonic()
+            slot = max(now, self.host_next_request.get(host, now))
+            self.host_next_request[host] = slot + self.host_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+#Fetches one page, retrying with exponential backoff
+#Returns the HTML text or raises the last error
+    @metrics.timed('http_fetch')
+    def fetch(self, url):
+#The scheduler does its own caching, rate limiting and retries
+        if self.scheduler:
+            return self.scheduler.submit(url, BATCH).result()
+
+#Fresh cached pages skip the rate limit and the network entirely
+        headers = {}
+        if self.cache:
+            html_content = self.cache.get_fresh(url)
+            if html_content is not None:
+                return html_content
+            headers = self.cache.conditional_headers(url)
+
+        attempt = 0
+        while True:
+            self.wait_for_host(url)
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    with self.stats_lock:
+                        self.stats['bytes'] += len(response.content)
+                    metrics.increment('bytes_downloaded', len(response.content))
+                    if self.cache:
+                        return self.cache.update(url, response)
+                    response.raise_for_status()
+                    return response.text
+                error = requests.HTTPError(f"{response.status_code} for url: {url}", response=response)
+                retry_after = response.headers.get('Retry-After')
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                retry_after = None
+
+            if attempt >= self.max_retries:
+                raise error
+
+#Honour Retry-After when the server sends a number of seconds
+            delay = self.backoff * (2 ** attempt)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            attempt += 1
+            with self.stats_lock:
+                self.stats['retries'] += 1
+            metrics.increment('fetch_retries')
+            time.sleep(delay)
+
+#Fetches and extracts one page in a single pass over the HTML
+#Returns the same dictionary scrape_all() would
+    def scrape(self, url):
+        html_content = self.fetch(url)
+        scraper = DrugInteractionScraper(url, session=self.session, parser=self.parser,
+                                         extraction_cache=self.extraction_cache)
+        scraper.load_html(html_content)
+        return scraper.extract_single_pass()
+
+#Scrapes every URL with at most max_workers in flight
+#Only two pages per worker are queued at a time, so a long URL list never sits in memory as futures
+#Yields (url, data, error) as each page finishes, one bad page never ends the run
+    def scrape_many(self, urls):
+        start = time.perf_counter()
+        urls = iter(urls)
+        window = self.max_workers * 2
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {}
+        try:
+            while True:
+                for url in itertools.islice(urls, window - len(futures)):
+                    futures[executor.submit(self.scrape, url)] = url
+                if not futures:
+                    break
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = futures.pop(future)
+                    try:
+                        data = future.result()
+                        error = None
+                    except requests.RequestException as e:
+                        data = None
+                        error = str(e)
+#Parse errors and anything else a page throws are reported against that page
+                    except Exception as e:
+                        data = None
+                        error = f"{type(e).__name__}: {e}"
+
+                    with self.stats_lock:
+                        if error:
+                            self.stats['failures'] += 1
+                            metrics.increment('fetch_failures')
+                        else:
+                            self.stats['pages'] += 1
+                        self.stats['elapsed'] = time.perf_counter() - start
+                    yield url, data, error
+        finally:
+#On Ctrl-C or an early stop the queued pages are dropped, only the ones already fetching are waited for
+            executor.shutdown(wait=True, cancel_futures=True)
+
+#Pages scraped per second over the last run
+    def pages_per_second(self):
+        elapsed = self.stats['elapsed']
+        return self.stats['pages'] / elapsed if elapsed > 0 else 0.0
+
+#Prints the totals for the last run
+    def print_summary(self):
+        print("\n" + "=" * 70)
+        print("BULK SCRAPE SUMMARY")
+        print("=" * 70)
+        print(f"Pages scraped: {self.stats['pages']}")
+        print(f"Failures: {self.stats['failures']}")
+        print(f"Retries: {self.stats['retries']}")
+        print(f"Downloaded: {self.stats['bytes']} bytes")
+        print(f"Elapsed: {self.stats['elapsed']:.2f}s ({self.pages_per_second():.1f} pages/s)")
+        if self.cache:
+            self.cache.print_summary()
+        if self.extraction_cache:
+            self.extraction_cache.print_summary()
+        print("=" * 70)
+
+    def close(self):
+        self.session.close()
+
+
+#Scrape every URL listed in a text file, one per line
+def main():
+    arg_parser = argparse.ArgumentParser(description="Scrape every interaction URL listed in a text file.")
+    arg_parser.add_argument('url_file', help="text file with one interaction URL per line")
+    arg_parser.add_argument('output_file', nargs='?', default='interactions.jsonl',
+                            help="JSON lines (or .msgpack) file the records are written to")
+    arg_parser.add_argument('max_workers', nargs='?', type=int, default=8, help="pages fetched at the same time")
+    arg_parser.add_argument('--offline', action='store_true', help="only use pages in the HTTP cache")
+    args = arg_parser.parse_args()
+
+    try:
+        with open(args.url_file, encoding='utf-8') as f:
+            urls = [line.strip() for line in f if line.strip()]
+    except OSError as e:
+        print(f"Error: Could not read '{args.url_file}': {e}")
+        sys.exit(1)
+    output_file = args.output_file
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    cache = HTTPCache(os.path.join(script_dir, '.http_cache'), offline=args.offline)
+#Pages answered 304 Not Modified come back with the same HTML, so their extraction is reused too
+    extraction_cache = ExtractionCache(path=os.path.join(script_dir, '.extraction_cache.db'))
+    scraper = BulkScraper(max_workers=args.max_workers, cache=cache, extraction_cache=extraction_cache)
+#Records stream to <output_file>.partial as they finish, renamed into place at the end
+    with RecordWriter(output_file) as writer:
+        for url, data, error in scraper.scrape_many(urls):
+            if error:
+                print(f" Error fetching URL: {error}")
+                continue
+            writer.write(data)
+    scraper.close()
+    extraction_cache.close()
+
+    scraper.print_summary()
+    print(f"Results saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#Array keeps the per-URL columns as packed machine integers
+from array import array
+#Bisect searches the sorted pair keys
+import bisect
+#Collections.abc gives the URL view the full read-only list interface
+from collections.abc import Sequence
+
+
+#Almost every sitemap URL is this prefix + drug1 + code1 + '-with-' + drug2 + code2 + suffix
+URL_PREFIX = 'https://www.drugs.com/drug-interactions/'
+URL_SUFFIX = '.html'
+PAIR_SEPARATOR = '-with-'
+
+#Drug id stored for URLs that don't name a drug pair
+NO_DRUG = 0xFFFFFFFF
+
+
+#Read-only list of URLs rebuilt from the compact columns on demand
+#Stands in for the old list of URL strings
+class InteractionURLs(Sequence):
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store.drug1)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store.url(row) for row in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('interaction index out of range')
+        return self.store.url(index)
+
+    def __iter__(self):
+        url = self.store.url
+        for row in range(len(self)):
+            yield url(row)
+
+
+#Interned, column-oriented store of every sitemap URL
+#Each drug name and numeric URL code is kept once and referred to by integer id,
+#so a URL costs four 32-bit ints instead of a full string
+class CompactInteractionStore:
+    def __init__(self):
+        self.names = []
+        self.name_ids = {}
+        self.codes = []
+        self.code_ids = {}
+
+#One entry per URL, in sitemap order
+        self.drug1 = array('I')
+        self.code1 = array('I')
+        self.drug2 = array('I')
+        self.code2 = array('I')
+
+#Row -> full URL for the few URLs that don't follow the usual pattern
+        self.irregular = {}
+
+#Sorted pair keys and the rows they belong to, built by finalize()
+        self.pair_keys = array('Q')
+        self.pair_rows = array('I')
+
+#Number of rows naming each drug id
+        self.name_rows = array('I')
+
+    def __len__(self):
+        return len(self.drug1)
+
+    def intern_name(self, name):
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def intern_code(self, code):
+        code_id = self.code_ids.get(code)
+        if code_id is None:
+            code_id = self.code_ids[code] = len(self.codes)
+            self.codes.append(code)
+        return code_id
+
+#Unordered pair of drug ids packed into one 64-bit key
+    def pair_key(self, id1, id2):
+        return (id1 << 32) | id2 if id1 <= id2 else (id2 << 32) | id1
+
+#Column values for one URL: (drug1, code1, drug2, code2, irregular URL or None)
+#Interns any names and codes it hasn't seen
+    def encode(self, url, drugs):
+#Kept whole in irregular, even if empty, so url() never looks up a drug for it
+        if not drugs:
+            return NO_DRUG, 0, NO_DRUG, 0, url or ''
+
+        name1, name2 = drugs
+        id1 = self.intern_name(name1)
+        id2 = self.intern_name(name2)
+
+#Keep whatever follows each drug name (the numeric id) so the URL can be rebuilt
+        if url.startswith(URL_PREFIX) and url.endswith(URL_SUFFIX):
+            part1, separator, part2 = url[len(URL_PREFIX):-len(URL_SUFFIX)].partition(PAIR_SEPARATOR)
+            if separator and part1.startswith(name1) and part2.startswith(name2):
+                return (id1, self.intern_code(part1[len(name1):]),
+                        id2, self.intern_code(part2[len(name2):]), None)
+        return id1, 0, id2, 0, url
+
+#Adds one sitemap URL with the drug pair extract_drugs_from_url() found in it
+    def add(self, url, drugs):
+        self.append_row(*self.encode(url, drugs))
+
+    def append_row(self, id1, code1, id2, code2, irregular):
+        if irregular is not None:
+            self.irregular[len(self.drug1)] = irregular
+        self.drug1.append(id1)
+        self.code1.append(code1)
+        self.drug2.append(id2)
+        self.code2.append(code2)
+        if id1 != NO_DRUG:
+            self.count_names(id1, id2, 1)
+
+#Rows still naming each drug, so names left over from removed URLs can be skipped
+    def count_names(self, id1, id2, change):
+        name_rows = self.name_rows
+        while len(name_rows) < len(self.names):
+            name_rows.append(0)
+        name_rows[id1] += change
+        name_rows[id2] += change
+
+#Drug names used by at least one URL
+    def live_names(self):
+        names = self.names
+        return [names[name_id] for name_id, count in enumerate(self.name_rows) if count]
+
+#First row with this URL that hasn't been matched yet, or None
+#Only the rows of the URL's own drug pair are compared
+    def find_row(self, url, drugs, matched):
+        if drugs:
+            id1 = self.name_ids.get(drugs[0])
+            id2 = self.name_ids.get(drugs[1])
+            if id1 is None or id2 is None:
+                return None
+            keys, rows = self.pair_keys, self.pair_rows
+            key = self.pair_key(id1, id2)
+            position = bisect.bisect_left(keys, key)
+            while position < len(keys) and keys[position] == key:
+                row = rows[position]
+                if not matched[row] and self.url(row) == url:
+                    return row
+                position += 1
+            return None
+
+#URLs without a drug pair are only kept in irregular
+        for row, irregular in self.irregular.items():
+            if irregular == url and not matched[row] and self.drug1[row] == NO_DRUG:
+                return row
+        return None
+
+#Store for a new version of the sitemap, built from this one without encoding kept URLs again
+#sources has one entry per URL in the new sitemap order: the row of this store it matched,
+#or -1 for the next (url, drugs) in added. Names and codes are interned again in order of
+#first use, so the result is the store a fresh load of the new sitemap builds, ids included
+#Call finalize() on it before lookups
+    def refreshed(self, sources, added):
+        other = CompactInteractionStore()
+        name_map = array('I', [NO_DRUG]) * len(self.names)
+        code_map = array('I', [NO_DRUG]) * len(self.codes)
+        names, codes = self.names, self.codes
+        drug1, code1, drug2, code2 = self.drug1, self.code1, self.drug2, self.code2
+        added = iter(added)
+
+        for row in sources:
+            if row < 0:
+                other.add(*next(added))
+                continue
+            irregular = self.irregular.get(row)
+            id1 = drug1[row]
+            if id1 == NO_DRUG:
+                other.append_row(NO_DRUG, 0, NO_DRUG, 0, irregular)
+                continue
+
+#Same interning order as encode(): both names, then both codes
+            new1 = name_map[id1]
+            if new1 == NO_DRUG:
+                new1 = name_map[id1] = other.intern_name(names[id1])
+            id2 = drug2[row]
+            new2 = name_map[id2]
+            if new2 == NO_DRUG:
+                new2 = name_map[id2] = other.intern_name(names[id2])
+            if irregular is not None:
+                other.append_row(new1, 0, new2, 0, irregular)
+                continue
+            new_code1 = code_map[code1[row]]
+            if new_code1 == NO_DRUG:
+                new_code1 = code_map[code1[row]] = other.intern_code(codes[code1[row]])
+            new_code2 = code_map[code2[row]]
+            if new_code2 == NO_DRUG:
+                new_code2 = code_map[code2[row]] = other.intern_code(codes[code2[row]])
+            other.append_row(new1, new_code1, new2, new_code2, None)
+        return other
+
+#True if any URL names this pair of drug names
+    def has_pair(self, name1, name2):
+        id1 = self.name_ids.get(name1)
+        id2 = self.name_ids.get(name2)
+        return id1 is not None and id2 is not None and len(self.rows_for_ids(id1, id2)) > 0
+
+#Rebuilds the full URL of one row
+    def url(self, row):
+        irregular = self.irregular.get(row)
+        if irregular is not None:
+            return irregular
+        return (URL_PREFIX + self.names[self.drug1[row]] + self.codes[self.code1[row]] + PAIR_SEPARATOR
+                + self.names[self.drug2[row]] + self.codes[self.code2[row]] + URL_SUFFIX)
+
+#Sorts rows by pair key so lookups can binary search
+#The sort is stable, so each pair's URLs stay in sitemap order
+    def finalize(self):
+        drug1, drug2, pair_key = self.drug1, self.drug2, self.pair_key
+        keys = array('Q', (pair_key(drug1[row], drug2[row]) for row in range(len(drug1))
+                           if drug1[row] != NO_DRUG))
+        rows = array('I', (row for row in range(len(drug1)) if drug1[row] != NO_DRUG))
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.pair_keys = array('Q', (keys[i] for i in order))
+        self.pair_rows = array('I', (rows[i] for i in order))
+
+#Rows for one pair of drug ids, in sitemap order
+    def rows_for_ids(self, id1, id2):
+        key = (id1 << 32) | id2 if id1 <= id2 else (id2 << 32) | id1
+        keys = self.pair_keys
+        start = bisect.bisect_left(keys, key)
+        if start == len(keys) or keys[start] != key:
+            return ()
+        return self.pair_rows[start:bisect.bisect_right(keys, key, start)]
+
+#URLs for a pair of normalized drug names, in sitemap order
+    def lookup(self, name1, name2):
+        id1 = self.name_ids.get(name1)
+        id2 = self.name_ids.get(name2)
+        if id1 is None or id2 is None:
+            return []
+        url = self.url
+        return [url(row) for row in self.rows_for_ids(id1, id2)]
+
+#Every distinct drug pair as (name1, name2)
+    def pairs(self):
+        names = self.names
+        previous = None
+        for key in self.pair_keys:
+            if key != previous:
+                previous = key
+                yield names[key >> 32], names[key & 0xFFFFFFFF]
+
+#Read-only list view of every URL
+    def urls(self):
+        return InteractionURLs(self)
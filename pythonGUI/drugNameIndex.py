@@ -0,0 +1,130 @@
+#Bisect finds prefix ranges in the sorted name list
+import bisect
+#Counter tallies shared trigrams in C rather than a Python loop
+from collections import Counter
+#Itertools chains the trigram posting lists together
+from itertools import chain
+
+
+#Edit distance from the typed text to the closest prefix of a name
+#Uses the bit-parallel Myers/Hyyro algorithm, one step per character of the name
+#Partly typed names score well against the names they are the start of
+#Characters past len(query) + max_distance can't lower the score, so they are skipped
+def prefix_edit_distance(query, name, max_distance=None):
+    if not query:
+        return 0
+    length = len(query)
+    top_bit = 1 << (length - 1)
+
+#Bit i of match_bits[c] is set when query[i] == c
+    match_bits = {}
+    for i, char in enumerate(query):
+        match_bits[char] = match_bits.get(char, 0) | (1 << i)
+    get_bits = match_bits.get
+
+    if max_distance is not None:
+        name = name[:length + max_distance]
+
+#Python ints act as endless two's complement, so the low bits stay exact without masking
+    positive, negative = -1, 0
+    score = best = length
+    for char in name:
+        equal = get_bits(char, 0)
+        x_vertical = equal | negative
+        x_horizontal = (((equal & positive) + positive) ^ positive) | equal
+        h_positive = negative | ~(x_horizontal | positive)
+        h_negative = positive & x_horizontal
+        if h_positive & top_bit:
+            score += 1
+        elif h_negative & top_bit:
+            score -= 1
+            if score < best:
+                best = score
+        h_positive = (h_positive << 1) | 1
+        positive = (h_negative << 1) | ~(x_vertical | h_positive)
+        negative = h_positive & x_vertical
+    return best
+
+
+#Trigrams of a name padded at the start, so matching first letters count extra
+def trigrams(name):
+    padded = '  ' + name
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+#Vocabulary of every drug name in the sitemap, for type-ahead suggestions
+#A sorted array answers prefixes, a trigram index finds near misses and typos
+class DrugNameIndex:
+    def __init__(self, names, max_candidates=15, min_grams=3, max_postings=2000):
+        self.names = sorted(set(names))
+        self.max_candidates = max_candidates
+        self.min_grams = min_grams
+        self.max_postings = max_postings
+
+#Trigram -> positions in self.names
+        postings = {}
+        for position, name in enumerate(self.names):
+            for gram in trigrams(name):
+                postings.setdefault(gram, []).append(position)
+        self.postings = {gram: tuple(positions) for gram, positions in postings.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        position = bisect.bisect_left(self.names, name)
+        return position < len(self.names) and self.names[position] == name
+
+#Names starting with prefix, in alphabetical order
+    def prefix_matches(self, prefix, k=10):
+        matches = []
+        position = bisect.bisect_left(self.names, prefix)
+        while position < len(self.names) and len(matches) < k:
+            name = self.names[position]
+            if not name.startswith(prefix):
+                break
+            matches.append(name)
+            position += 1
+        return matches
+
+#Closest names by prefix edit distance, checked only for names sharing the most trigrams
+#Returns (name, distance) pairs, closest first
+    def fuzzy_matches(self, query, k=10, max_distance=None):
+        if max_distance is None:
+            max_distance = max(2, len(query) // 3)
+
+#Count the rarest trigrams first and stop once enough postings are in,
+#common trigrams barely narrow the search and dominate the cost
+        postings = sorted((self.postings[gram] for gram in trigrams(query) if gram in self.postings), key=len)
+        used = 0
+        total = 0
+        for positions in postings:
+            if used >= self.min_grams and total + len(positions) > self.max_postings:
+                break
+            used += 1
+            total += len(positions)
+        overlap = Counter(chain.from_iterable(postings[:used]))
+
+#At least k candidates are checked, otherwise a large k could never be filled
+        scored = []
+        for position, _ in overlap.most_common(max(self.max_candidates, k)):
+            name = self.names[position]
+            distance = prefix_edit_distance(query, name, max_distance)
+#Salt names like "acebutolol-hcl" are allowed to match on their base name
+            if distance > max_distance and name in query:
+                distance = max_distance
+            if distance <= max_distance:
+                scored.append((distance, name))
+
+        scored.sort()
+        return [(name, distance) for distance, name in scored[:k]]
+
+#Prefix completions while the typed text is the start of a known name
+#Spelling suggestions once it stops matching anything
+    def suggest(self, query, k=10):
+        if not query:
+            return []
+        suggestions = self.prefix_matches(query, k)
+        if suggestions:
+            return suggestions
+        return [name for name, _ in self.fuzzy_matches(query, k)]
@@ -0,0 +1,162 @@
+#SQLite keeps memoized extractions between runs
+import sqlite3
+#Hashlib fingerprints page content
+import hashlib
+#JSON stores each extraction compactly and hands out fresh copies
+import json
+#OrderedDict tracks least recently used entries
+from collections import OrderedDict
+#Threading guards the cache when bulk workers share it
+import threading
+#Time records when a stored entry was last used
+import time
+
+from interactionMetrics import metrics
+
+
+#Extraction results memoized by a hash of the page HTML
+#Identical pages are returned without being parsed again
+#Entries live in a bounded LRU in memory, and optionally in a SQLite file so they survive restarts
+#New entries are written to the file in batches of write_batch, and reads never write,
+#so the file is trimmed by when entries were stored rather than last used
+#A file several processes share is fine, SQLite errors only turn into misses
+class ExtractionCache:
+    def __init__(self, max_entries=10000, path=None, max_stored_entries=500000, write_batch=100, timeout=30):
+        self.max_entries = max_entries
+        self.max_stored_entries = max_stored_entries
+        self.write_batch = write_batch
+        self.entries = OrderedDict()
+#Entries waiting for the next batch write
+        self.pending = {}
+        self.stored_since_trim = 0
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'stored_hits': 0, 'misses': 0, 'evictions': 0, 'errors': 0}
+
+        self.connection = None
+        if path:
+            try:
+#timeout is SQLite's busy timeout, other processes' writes are waited for instead of failing
+                self.connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+                self.connection.execute('PRAGMA journal_mode=WAL')
+                self.connection.execute('PRAGMA synchronous=NORMAL')
+                self.connection.execute(
+                    'CREATE TABLE IF NOT EXISTS extractions (key TEXT PRIMARY KEY, data TEXT NOT NULL, last_used REAL)')
+                self.connection.execute(
+                    'CREATE INDEX IF NOT EXISTS extractions_last_used ON extractions(last_used)')
+                self.connection.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not open extraction cache '{path}', memoizing in memory only: {e}")
+                self.connection = None
+
+#Content hash of a page plus whatever else changes the result (parser, rule version)
+    def key(self, html_content, *context):
+        digest = hashlib.sha256('\0'.join(str(part) for part in context).encode('utf-8') + b'\0')
+        digest.update(html_content.encode('utf-8', errors='surrogatepass'))
+        return digest.hexdigest()
+
+#A fresh copy of the stored extraction, or None
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                metrics.increment('extraction_cache_hits')
+                return json.loads(data)
+
+            data = self.read_stored(key)
+            if data is not None:
+                self.remember(key, data)
+                self.stats['hits'] += 1
+                self.stats['stored_hits'] += 1
+                metrics.increment('extraction_cache_hits')
+                return json.loads(data)
+
+            self.stats['misses'] += 1
+            metrics.increment('extraction_cache_misses')
+            return None
+
+#Looks in the batch not written yet, then the SQLite file
+    def read_stored(self, key):
+        data = self.pending.get(key)
+        if data is not None or self.connection is None:
+            return data
+        try:
+            row = self.connection.execute('SELECT data FROM extractions WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            self.stats['errors'] += 1
+            return None
+        return row[0] if row else None
+
+    def put(self, key, extraction):
+        data = json.dumps(extraction, ensure_ascii=False, separators=(',', ':'))
+        with self.lock:
+            self.remember(key, data)
+            if self.connection is not None:
+                self.pending[key] = data
+                if len(self.pending) >= self.write_batch:
+                    self.flush_locked()
+
+#Writes the pending batch in one transaction
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        if not self.pending or self.connection is None:
+            return
+        now = time.time()
+        try:
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO extractions (key, data, last_used) VALUES (?, ?, ?)',
+                    [(key, data, now) for key, data in self.pending.items()])
+        except sqlite3.Error:
+#Losing a batch only costs parsing those pages again next time
+            self.stats['errors'] += 1
+        self.stored_since_trim += len(self.pending)
+        self.pending = {}
+        if self.stored_since_trim >= 1000:
+            self.trim_stored()
+
+#Adds to the in-memory LRU, dropping the least recently used entries past max_entries
+    def remember(self, key, data):
+        self.entries[key] = data
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+#Keeps the SQLite file to max_stored_entries, oldest first
+    def trim_stored(self):
+        self.stored_since_trim = 0
+        try:
+            count = self.connection.execute('SELECT COUNT(*) FROM extractions').fetchone()[0]
+            if count > self.max_stored_entries:
+                with self.connection:
+                    self.connection.execute(
+                        'DELETE FROM extractions WHERE key IN '
+                        '(SELECT key FROM extractions ORDER BY last_used LIMIT ?)', (count - self.max_stored_entries,))
+                self.stats['evictions'] += count - self.max_stored_entries
+        except sqlite3.Error:
+            self.stats['errors'] += 1
+
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def print_summary(self):
+        line = (f"Extraction cache: {self.stats['hits']} hits ({self.stats['stored_hits']} from disk), "
+                f"{self.stats['misses']} misses, {self.hit_rate():.0%} hit rate, "
+                f"{self.stats['evictions']} evicted")
+        if self.stats['errors']:
+            line += f", {self.stats['errors']} storage errors"
+        print(line)
+
+#Writes the last batch and closes the file
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.flush_locked()
+                self.connection.close()
+                self.connection = None
@@ -0,0 +1,348 @@
+#Requests does the actual page downloads over one pooled session
+import requests
+from requests.adapters import HTTPAdapter
+#Futures hands each caller a result it can wait on
+from concurrent.futures import Future
+#Deque and heapq hold the queued and backed-off fetches
+from collections import deque
+import heapq
+#URLLibrary finds the host each URL belongs to
+from urllib.parse import urlparse
+#Threading runs the fetch workers
+import threading
+#Time drives the token buckets, backoff and latency tracking
+import time
+#Itertools numbers delayed jobs so the heap never compares them
+import itertools
+
+from interactionScraperHTML import HEADERS
+from interactionMetrics import metrics
+
+
+#Lanes, lower numbers are served first
+INTERACTIVE = 0
+BATCH = 1
+LANE_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+#These responses are worth another try after backing off
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+#Per-host request budget, refilled at rate tokens per second up to burst
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+#Set from Retry-After, no requests to the host until then
+        self.paused_until = 0.0
+
+#Seconds until a token is free, 0 if one can be taken now
+    def wait_time(self, now):
+        if now < self.paused_until:
+            return self.paused_until - now
+        if not self.rate:
+            return 0.0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        if self.rate:
+            self.tokens -= 1
+
+    def pause(self, seconds, now):
+        self.paused_until = max(self.paused_until, now + seconds)
+
+
+#Batch concurrency limit that grows while responses are healthy and
+#halves on 429/5xx, timeouts and latency spikes (additive increase, multiplicative decrease)
+class AdaptiveLimit:
+    def __init__(self, maximum, minimum=1, spike_factor=3.0, min_spike=1.0):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(maximum)
+#A response counts as a spike when it is this many times the usual latency
+        self.spike_factor = spike_factor
+        self.min_spike = min_spike
+        self.latency = None
+        self.last_decrease = 0.0
+
+#Records one healthy response and its latency in seconds
+    def record(self, latency, now):
+        if self.latency is not None and latency > max(self.spike_factor * self.latency, self.min_spike):
+            self.decrease(now)
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+
+#One cut per second, so a burst of errors from the same overload only counts once
+    def decrease(self, now):
+        if now - self.last_decrease >= 1.0:
+            self.limit = max(self.minimum, self.limit / 2)
+            self.last_decrease = now
+            metrics.increment('fetch_concurrency_decreases')
+
+
+#One queued, running or backed-off page fetch, shared by everyone asking for its URL
+class FetchJob:
+    def __init__(self, url, priority):
+        self.url = url
+        self.priority = priority
+        self.future = Future()
+        self.state = 'queued'
+        self.attempts = 0
+        self.submitted = time.monotonic()
+
+
+#Shared page fetcher for GUI lookups and background crawls
+#Interactive fetches always go ahead of batch ones and have worker threads of their own,
+#so a single lookup never waits behind a crawl. Each host gets a token bucket and batch
+#concurrency adapts to how the server is coping. Requests for a URL already being
+#fetched share the one download.
+class FetchScheduler:
+    def __init__(self, max_concurrency=8, interactive_slots=2, requests_per_second=2.0, burst=2,
+                 interactive_timeout=5, batch_timeout=20, interactive_retries=1, batch_retries=3,
+                 backoff=0.5, cache=None):
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.timeouts = {INTERACTIVE: interactive_timeout, BATCH: batch_timeout}
+        self.retries = {INTERACTIVE: interactive_retries, BATCH: batch_retries}
+        self.backoff = backoff
+#Optional HTTPCache checked before any request goes out
+        self.cache = cache
+
+        worker_count = max_concurrency + interactive_slots
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=worker_count, pool_maxsize=worker_count)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+#Everything below is guarded by the condition's lock
+        self.condition = threading.Condition()
+        self.lanes = {INTERACTIVE: deque(), BATCH: deque()}
+        self.delayed = []
+        self.sequence = itertools.count()
+        self.in_flight = {}
+        self.hosts = {}
+        self.active = {INTERACTIVE: 0, BATCH: 0}
+        self.batch_limit = AdaptiveLimit(max_concurrency)
+        self.closed = False
+
+        self.stats = {lane: {'fetches': 0, 'failures': 0, 'retries': 0, 'latencies': deque(maxlen=10000)}
+                      for lane in LANE_NAMES}
+        self.stats_lock = threading.Lock()
+
+        self.workers = [threading.Thread(target=self.work, daemon=True) for _ in range(worker_count)]
+        for worker in self.workers:
+            worker.start()
+
+#Queues a fetch and returns a Future for the page HTML
+#Asking again for a URL already queued returns the same Future,
+#and moves it to the interactive lane if that is where the new request came from
+    def submit(self, url, priority=BATCH):
+        if self.cache:
+            try:
+                html_content = self.cache.get_fresh(url)
+            except requests.RequestException as e:
+                return self.failed(e)
+            if html_content is not None:
+                future = Future()
+                future.set_result(html_content)
+                return future
+
+        with self.condition:
+            if self.closed:
+                return self.failed(RuntimeError("Fetch scheduler is closed"))
+            job = self.in_flight.get(url)
+            if job is not None:
+                metrics.increment('fetch_deduplicated')
+                if priority < job.priority:
+                    job.priority = priority
+                    job.submitted = time.monotonic()
+                    if job.state == 'queued':
+                        self.lanes[priority].append(job)
+                        self.condition.notify()
+                return job.future
+
+            job = FetchJob(url, priority)
+            self.in_flight[url] = job
+            self.lanes[priority].append(job)
+            self.condition.notify()
+            return job.future
+
+#Fetches one page and waits for it, interactive unless told otherwise
+    def fetch(self, url, priority=INTERACTIVE):
+        return self.submit(url, priority).result()
+
+    def failed(self, error):
+        future = Future()
+        future.set_exception(error)
+        return future
+
+    def bucket(self, url):
+        host = urlparse(url).netloc
+        bucket = self.hosts.get(host)
+        if bucket is None:
+            bucket = self.hosts[host] = TokenBucket(self.requests_per_second, self.burst)
+        return bucket
+
+#Picks the next job that may start now, interactive first
+#Returns (job, None) or (None, seconds until something could be ready)
+    def next_job(self, now):
+        while self.delayed and self.delayed[0][0] <= now:
+            _, _, job = heapq.heappop(self.delayed)
+            job.state = 'queued'
+            self.lanes[job.priority].append(job)
+        wait = self.delayed[0][0] - now if self.delayed else None
+
+        for lane in (INTERACTIVE, BATCH):
+            queue = self.lanes[lane]
+#Jobs promoted to interactive leave a stale entry behind in the batch lane
+            while queue and (queue[0].priority != lane or queue[0].state != 'queued'):
+                queue.popleft()
+            if not queue:
+                continue
+            if lane == BATCH and self.active[BATCH] >= int(self.batch_limit.limit):
+                continue
+
+            bucket = self.bucket(queue[0].url)
+            host_wait = bucket.wait_time(now)
+            if host_wait > 0:
+                wait = host_wait if wait is None else min(wait, host_wait)
+                continue
+            bucket.take()
+            return queue.popleft(), None
+        return None, wait
+
+    def work(self):
+        while True:
+            with self.condition:
+                job = None
+                while job is None:
+                    if self.closed:
+                        return
+                    job, wait = self.next_job(time.monotonic())
+                    if job is None:
+                        self.condition.wait(wait)
+                job.state = 'running'
+                lane = job.priority
+                self.active[lane] += 1
+            try:
+                self.run(job)
+            finally:
+                with self.condition:
+                    self.active[lane] -= 1
+                    self.condition.notify_all()
+
+#Downloads one job, requeueing it with backoff on errors worth retrying
+    def run(self, job):
+        headers = self.cache.conditional_headers(job.url) if self.cache else {}
+        start = time.monotonic()
+        retry_after = None
+        try:
+            response = self.session.get(job.url, headers=headers, timeout=self.timeouts[job.priority])
+            if response.status_code in RETRY_STATUSES:
+                retry_after = response.headers.get('Retry-After')
+                error = requests.HTTPError(f"{response.status_code} for url: {job.url}", response=response)
+            else:
+                with self.condition:
+                    self.batch_limit.record(time.monotonic() - start, time.monotonic())
+                metrics.increment('bytes_downloaded', len(response.content))
+                if self.cache:
+                    html_content = self.cache.update(job.url, response)
+                else:
+                    response.raise_for_status()
+                    html_content = response.text
+                self.finish(job, html_content)
+                return
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        except Exception as e:
+            self.finish(job, error=e)
+            return
+
+#Overloaded or unreachable, slow down before anything else is sent
+        now = time.monotonic()
+        with self.condition:
+            self.batch_limit.decrease(now)
+            if retry_after and retry_after.isdigit():
+                self.bucket(job.url).pause(int(retry_after), now)
+        metrics.increment('fetch_throttled')
+
+        if job.attempts >= self.retries[job.priority]:
+            self.finish(job, error=error)
+            return
+
+        delay = self.backoff * (2 ** job.attempts)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+        job.attempts += 1
+        with self.stats_lock:
+            self.stats[job.priority]['retries'] += 1
+        metrics.increment('fetch_retries')
+        with self.condition:
+            job.state = 'delayed'
+            heapq.heappush(self.delayed, (now + delay, next(self.sequence), job))
+            self.condition.notify()
+
+    def finish(self, job, html_content=None, error=None):
+        with self.condition:
+            self.in_flight.pop(job.url, None)
+            job.state = 'done'
+
+        latency = time.monotonic() - job.submitted
+        with self.stats_lock:
+            stats = self.stats[job.priority]
+            stats['fetches'] += 1
+            stats['latencies'].append(latency)
+            if error:
+                stats['failures'] += 1
+        metrics.record(f'fetch_{LANE_NAMES[job.priority]}', latency)
+
+        if error:
+            metrics.increment('fetch_failures')
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(html_content)
+
+#Latency from submit to result, per lane, in seconds
+    def latency_percentiles(self, lane):
+        with self.stats_lock:
+            latencies = sorted(self.stats[lane]['latencies'])
+        if not latencies:
+            return {}
+        return {
+            'p50': latencies[len(latencies) // 2],
+            'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        }
+
+    def print_summary(self):
+        print("\n" + "=" * 70)
+        print("FETCH SCHEDULER SUMMARY")
+        print("=" * 70)
+        for lane, name in LANE_NAMES.items():
+            stats = self.stats[lane]
+            percentiles = self.latency_percentiles(lane)
+            line = f"{name}: {stats['fetches']} fetches, {stats['failures']} failed, {stats['retries']} retries"
+            if percentiles:
+                line += f", p50 {percentiles['p50'] * 1000:.0f}ms, p99 {percentiles['p99'] * 1000:.0f}ms"
+            print(line)
+        print(f"Batch concurrency limit: {self.batch_limit.limit:.1f}")
+        print("=" * 70)
+
+#Stops the workers, queued fetches are cancelled
+    def close(self):
+        with self.condition:
+            self.closed = True
+            pending = [job for job in self.in_flight.values() if job.state != 'running']
+            self.condition.notify_all()
+        for job in pending:
+            job.future.cancel()
+        for worker in self.workers:
+            worker.join()
+        self.session.close()
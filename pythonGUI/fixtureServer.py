@@ -0,0 +1,247 @@
+#HTTP server answers for drugs.com with saved pages
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+#Functools binds the fixture directory into the request handler
+import functools
+#Threading runs the server next to the scraper under test
+import threading
+#Argparse reads the fixture server command line
+import argparse
+#Contextlib silences the extract_* methods' progress prints during a check
+import contextlib
+#Time adds response delays and measures throughput
+import time
+#System provides the exit code
+import sys
+#Tempfile holds the knowledge base a crawl check writes
+import tempfile
+#OS finds the fixture pages next to this script
+import os
+
+
+#Saved interaction pages, named after their drugs.com URL like bulkExtract expects
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'pages')
+#Sitemap listing every fixture page under its drugs.com URL
+FIXTURE_SITEMAP = os.path.join(os.path.dirname(FIXTURE_DIR), 'sitemap.xml')
+
+
+#Serves the saved pages, optionally slow or failing, like a busy drugs.com would be
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.path_requests[self.path] = server.path_requests.get(self.path, 0) + 1
+            attempt = server.path_requests[self.path]
+        if server.delay:
+            time.sleep(server.delay)
+#The first fail_first requests for each page get a 503, so retries and backoff get exercised
+        if attempt <= server.fail_first:
+            self.send_response(503)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+#Local stand-in for drugs.com, run on a background thread
+#Point a BulkScraper at base_url, or the knowledge base crawl with --base-url
+class FixtureServer:
+    def __init__(self, directory=FIXTURE_DIR, port=0, delay=0.0, fail_first=0, verbose=False):
+        self.directory = directory
+        handler = functools.partial(FixtureRequestHandler, directory=directory)
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.path_requests = {}
+        self.server.delay = delay
+        self.server.fail_first = fail_first
+        self.server.verbose = verbose
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+#Local URL of every saved page, sorted by name
+    def page_urls(self):
+        return [self.base_url + name for name in sorted(os.listdir(self.directory)) if name.endswith('.html')]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+#Backends extract_single_pass must agree with the extract_* methods on
+PARSER_BACKENDS = ('html.parser', 'lxml')
+
+
+#Extracts every saved page with each extract_* method on its own and with extract_single_pass,
+#for both parser backends, and counts the pages where the two differ
+def check_extraction(directory=FIXTURE_DIR):
+    from interactionScraperHTML import DrugInteractionScraper
+    from bulkExtract import url_for_file
+    from bs4 import FeatureNotFound
+
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.html'))
+    problems = 0
+    for parser in PARSER_BACKENDS:
+        for name in names:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                html_content = f.read()
+            try:
+                with contextlib.redirect_stdout(None):
+                    scraper = DrugInteractionScraper(url_for_file(name), parser=parser)
+                    scraper.load_html(html_content)
+                    scraper.interaction_data['url'] = scraper.url
+                    scraper.extract_drug_names()
+                    scraper.extract_interaction_severity()
+                    scraper.extract_interaction_description()
+                    scraper.extract_professional_info()
+                    scraper.extract_references()
+                    expected = scraper.interaction_data
+
+                    scraper = DrugInteractionScraper(url_for_file(name), parser=parser)
+                    scraper.load_html(html_content)
+                    data = scraper.extract_single_pass()
+            except FeatureNotFound:
+                print(f"  {parser} is not installed")
+                problems += 1
+                break
+            if data != expected:
+                differing = sorted(key for key in expected.keys() | data.keys() if expected.get(key) != data.get(key))
+                print(f"  {name} ({parser}): extract_single_pass differs in {', '.join(differing)}")
+                problems += 1
+    print(f"Extraction: {len(names)} pages x {len(PARSER_BACKENDS)} parsers, {problems} problems")
+    return problems
+
+
+#Scrapes every fixture page through the server and checks it against extracting the saved file directly
+#Returns the number of pages that failed or came out different
+def check_bulk_scrape(server, max_workers=4):
+#Imported here so serving pages never pulls in the scraper
+    from bulkScraper import BulkScraper
+    from bulkExtract import extract_page
+
+    scraper = BulkScraper(max_workers=max_workers, requests_per_second=0, backoff=0)
+    problems = 0
+    try:
+        for url, data, error in scraper.scrape_many(server.page_urls()):
+            name = url[len(server.base_url):]
+            if error:
+                print(f"  {name}: {error}")
+                problems += 1
+                continue
+            expected = extract_page(name, os.path.join(server.directory, name), None, scraper.parser)
+            data['url'] = expected['url']
+            if data != expected:
+                print(f"  {name}: scraped data differs from the saved page")
+                problems += 1
+    finally:
+        scraper.close()
+    print(f"Bulk scrape: {scraper.stats['pages']} pages, {scraper.stats['failures']} failures, "
+          f"{scraper.stats['retries']} retries, {scraper.pages_per_second():.1f} pages/s")
+    return problems
+
+
+#Counts the crawled records that differ from extracting the saved page directly
+def check_stored(knowledge_base, urls, directory, parser):
+    from bulkExtract import extract_page
+
+    problems = 0
+    for url in urls:
+        name = url.rsplit('/', 1)[1]
+        expected = extract_page(name, os.path.join(directory, name), None, parser)
+        if knowledge_base.get(url) != {key: value for key, value in expected.items() if value is not None}:
+            print(f"  {name}: stored record differs from the saved page")
+            problems += 1
+    return problems
+
+
+#Crawls the fixture sitemap into a scratch knowledge base through the server, twice
+#The first run must save every page under its sitemap URL, the second must find nothing left to do
+def check_crawl(server, sitemap=FIXTURE_SITEMAP, max_workers=4):
+    from InteractionXMLParser import DrugInteractionParser
+    from interactionKnowledgeBase import InteractionKnowledgeBase
+    from bulkScraper import BulkScraper
+
+    urls = list(DrugInteractionParser(os.path.abspath(sitemap), streaming=True, use_cache=False).interactions)
+    problems = 0
+    with tempfile.TemporaryDirectory() as scratch:
+        for run in range(2):
+            knowledge_base = InteractionKnowledgeBase(os.path.join(scratch, 'interactions.db'))
+            scraper = BulkScraper(max_workers=max_workers, requests_per_second=0, backoff=0)
+            try:
+                knowledge_base.crawl(urls, scraper, batch_size=4, base_url=server.base_url)
+                if run == 1 and knowledge_base.stats['skipped'] != len(urls):
+                    print(f"  resumed crawl skipped {knowledge_base.stats['skipped']} of {len(urls)} pages")
+                    problems += 1
+                if run == 0:
+                    problems += check_stored(knowledge_base, urls, server.directory, scraper.parser)
+            finally:
+                scraper.close()
+                knowledge_base.close()
+    print(f"Crawl: {len(urls)} sitemap pages, {problems} problems")
+    return problems
+
+
+#Serves the fixture pages, or runs the scrapers against them with --check
+def main():
+    arg_parser = argparse.ArgumentParser(description="Local stand-in for drugs.com serving saved interaction pages.")
+    arg_parser.add_argument('--dir', default=FIXTURE_DIR, help="directory of saved pages")
+    arg_parser.add_argument('--port', type=int, default=8765, help="port to listen on, 0 for any free port")
+    arg_parser.add_argument('--delay', type=float, default=0.0, help="seconds to wait before every response")
+    arg_parser.add_argument('--fail-first', type=int, default=0,
+                            help="answer the first N requests for each page with 503")
+    arg_parser.add_argument('--workers', type=int, default=4)
+    arg_parser.add_argument('--check', action='store_true',
+                            help="check extraction, scrape and crawl every page through the server, report pages/s and exit")
+    arg_parser.add_argument('--sitemap', default=FIXTURE_SITEMAP, help="sitemap the --check crawl reads")
+    args = arg_parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        print(f"Error: '{args.dir}' is not a directory")
+        sys.exit(1)
+
+    server = FixtureServer(args.dir, port=0 if args.check else args.port, delay=args.delay,
+                           fail_first=args.fail_first, verbose=not args.check)
+    with server:
+        if args.check:
+            problems = check_extraction(args.dir)
+            problems += check_bulk_scrape(server, args.workers)
+            problems += check_crawl(server, args.sitemap, args.workers)
+            print(f"Server handled {server.requests} requests")
+            sys.exit(1 if problems else 0)
+
+        print(f"Serving {args.dir} at {server.base_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#Requests supplies the error type raised for offline cache misses
+import requests
+#Hashlib names cache files after the URL and the page contents
+import hashlib
+#JSON stores the metadata kept for each cached URL
+import json
+#OS manages the cache directory
+import os
+#Threading lets bulk scrapers share one cache
+import threading
+#Time checks entries against the TTL
+import time
+
+from interactionMetrics import metrics
+
+
+#Raised in offline mode when a page was never cached
+class OfflineCacheMiss(requests.RequestException):
+    pass
+
+
+#Hits only rewrite an entry's last_access this often, so LRU order survives restarts
+#without a file write on every hit
+ACCESS_WRITE_INTERVAL = 3600
+
+#Eviction frees space down to this share of max_bytes, so it doesn't run on every update
+EVICT_TARGET = 0.9
+
+
+#Decodes a cached body the way requests builds response.text
+def decode_body(body, encoding):
+    try:
+        return str(body, encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return str(body, 'utf-8', errors='replace')
+
+
+#On-disk cache of raw interaction pages
+#Page bodies are stored by content hash so identical pages are kept once
+#Each URL has a small JSON entry pointing at its body plus ETag/Last-Modified
+class HTTPCache:
+    def __init__(self, cache_dir='.http_cache', ttl=7 * 24 * 3600,
+                 max_bytes=500 * 1024 * 1024, offline=False):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+
+        self.entry_dir = os.path.join(cache_dir, 'entries')
+        self.body_dir = os.path.join(cache_dir, 'bodies')
+        os.makedirs(self.entry_dir, exist_ok=True)
+        os.makedirs(self.body_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'bytes_saved': 0}
+
+#Load every entry once so lookups and eviction never scan the disk
+        self.entries = {}
+#Bodies are shared, so count the entries pointing at each one and the bytes on disk
+        self.references = {}
+        self.total_bytes = 0
+#last_access as it was last written to each entry file
+        self.written_access = {}
+        for name in os.listdir(self.entry_dir):
+            try:
+                with open(os.path.join(self.entry_dir, name), encoding='utf-8') as f:
+                    entry = json.load(f)
+                self.entries[entry['url']] = entry
+            except (OSError, ValueError, KeyError):
+                continue
+            self.add_reference(entry)
+            self.written_access[entry['url']] = entry['last_access']
+        self.evict()
+
+    def url_key(self, url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def body_path(self, content_hash):
+        return os.path.join(self.body_dir, content_hash + '.html')
+
+    def entry_path(self, url):
+        return os.path.join(self.entry_dir, self.url_key(url) + '.json')
+
+#Reads a cached body, or None if it has gone missing
+#Bodies are the bytes the server sent, decoded with the encoding stored beside them
+    def read_body(self, entry):
+        try:
+            with open(self.body_path(entry['content_hash']), 'rb') as f:
+                return decode_body(f.read(), entry.get('encoding'))
+        except OSError:
+            return None
+
+    def add_reference(self, entry):
+        content_hash = entry['content_hash']
+        if content_hash not in self.references:
+            self.references[content_hash] = 0
+            self.total_bytes += entry['size']
+        self.references[content_hash] += 1
+
+#Removes the body from disk once no entry points at it
+    def drop_reference(self, entry):
+        content_hash = entry['content_hash']
+        self.references[content_hash] -= 1
+        if self.references[content_hash]:
+            return
+        del self.references[content_hash]
+        self.total_bytes -= entry['size']
+        try:
+            os.remove(self.body_path(content_hash))
+        except OSError:
+            pass
+
+#Records a cache hit and marks the entry as recently used
+    def hit(self, entry, revalidated=False):
+        entry['last_access'] = time.time()
+        if entry['last_access'] - self.written_access.get(entry['url'], 0) >= ACCESS_WRITE_INTERVAL:
+            self.write_entry(entry)
+        self.stats['hits'] += 1
+        self.stats['bytes_saved'] += entry['size']
+        metrics.increment('cache_hits')
+        metrics.increment('cache_bytes_saved', entry['size'])
+        if revalidated:
+            self.stats['revalidated'] += 1
+            metrics.increment('cache_revalidated')
+
+#Returns the cached page if it is still inside the TTL
+#Offline mode returns any cached copy and never lets the caller go to the network
+    def get_fresh(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry and (self.offline or time.time() - entry['fetched_at'] < self.ttl):
+                html_content = self.read_body(entry)
+                if html_content is not None:
+                    self.hit(entry)
+                    return html_content
+
+            if self.offline:
+                self.stats['misses'] += 1
+                metrics.increment('cache_misses')
+                raise OfflineCacheMiss(f"Offline and not cached: {url}")
+        return None
+
+#Headers that let the server answer 304 Not Modified
+#No validators are sent for an entry whose body has gone missing, deleted by hand or by
+#another process sharing the directory, since a 304 would leave nothing to return
+    def conditional_headers(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+            headers = {}
+            if entry:
+                if not os.path.exists(self.body_path(entry['content_hash'])):
+                    self.forget(entry)
+                    return headers
+                if entry.get('etag'):
+                    headers['If-None-Match'] = entry['etag']
+                if entry.get('last_modified'):
+                    headers['If-Modified-Since'] = entry['last_modified']
+            return headers
+
+#Stores a network response, or reuses the cached body on a 304
+#Returns the page HTML
+    def update(self, url, response):
+        with self.lock:
+            entry = self.entries.get(url)
+            if response.status_code == 304 and entry:
+                html_content = self.read_body(entry)
+                if html_content is not None:
+                    entry['fetched_at'] = time.time()
+                    self.hit(entry, revalidated=True)
+                    if self.written_access.get(url) != entry['last_access']:
+                        self.write_entry(entry)
+                    return html_content
+#The body went missing after the request was sent, the next request goes without validators
+                self.forget(entry)
+                raise requests.HTTPError(f"304 for url with no cached copy: {url}", response=response)
+
+            response.raise_for_status()
+            body = response.content
+            encoding = response.encoding or response.apparent_encoding
+            html_content = decode_body(body, encoding)
+            content_hash = hashlib.sha256(body).hexdigest()
+
+            path = self.body_path(content_hash)
+            if content_hash not in self.references:
+                self.write_file(path, body)
+
+            old_entry = entry
+            entry = {
+                'url': url,
+                'content_hash': content_hash,
+                'size': len(body),
+                'encoding': encoding,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'fetched_at': time.time(),
+                'last_access': time.time(),
+            }
+            self.entries[url] = entry
+            self.add_reference(entry)
+#The replaced body is deleted if nothing else shares it
+            if old_entry is not None:
+                self.drop_reference(old_entry)
+            self.write_entry(entry)
+            self.stats['misses'] += 1
+            metrics.increment('cache_misses')
+            self.evict()
+            return html_content
+
+#Fetches a page through the cache
+#Only goes to the network when the entry is missing or stale
+    def fetch(self, url, http=requests, headers=None, timeout=10):
+        html_content = self.get_fresh(url)
+        if html_content is not None:
+            return html_content
+
+        request_headers = dict(headers or {})
+        request_headers.update(self.conditional_headers(url))
+        response = http.get(url, headers=request_headers, timeout=timeout)
+        metrics.increment('bytes_downloaded', len(response.content))
+        return self.update(url, response)
+
+#Drops least recently used entries once the bodies on disk pass max_bytes
+#Frees down to EVICT_TARGET of max_bytes so the sort doesn't run on every update
+    def evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+
+        target = self.max_bytes * EVICT_TARGET
+        for entry in sorted(self.entries.values(), key=lambda e: e['last_access']):
+            if self.total_bytes <= target:
+                break
+            self.forget(entry)
+
+#Removes an entry and its file, and the body once nothing else shares it
+    def forget(self, entry):
+        del self.entries[entry['url']]
+        self.written_access.pop(entry['url'], None)
+        try:
+            os.remove(self.entry_path(entry['url']))
+        except OSError:
+            pass
+        self.drop_reference(entry)
+
+    def write_entry(self, entry):
+        self.write_file(self.entry_path(entry['url']), json.dumps(entry).encode('utf-8'))
+        self.written_access[entry['url']] = entry['last_access']
+
+#Write to a temp file then rename so a crash never leaves half a page
+    def write_file(self, path, data):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+#Prints hit/miss totals for this run
+    def print_summary(self):
+        print(f"Cache: {self.stats['hits']} hits ({self.stats['revalidated']} revalidated), "
+              f"{self.stats['misses']} misses, {self.stats['bytes_saved']} bytes saved")
@@ -0,0 +1,229 @@
+#Array keeps the adjacency lists as packed machine integers
+from array import array
+#Struct packs the binary export header
+import struct
+#Argparse reads the graph command line
+import argparse
+#Time reports how long building and lookups take
+import time
+#System provides the exit code and byte order
+import sys
+#OS swaps finished export files into place
+import os
+
+from compactInteractionStore import NO_DRUG
+
+
+#Binary export: header, offsets, neighbors, then the drug names one per line
+GRAPH_MAGIC = b'DIGR'
+GRAPH_FORMAT_VERSION = 1
+GRAPH_HEADER = struct.Struct('<4sIII')
+
+
+#Drug-drug graph of every pair named in the sitemap, in CSR form
+#Drug ids are the store's interned name ids. The neighbors of drug i are
+#neighbors[offsets[i]:offsets[i + 1]], sorted by id, each pair counted once
+class InteractionGraph:
+    def __init__(self, names, offsets, neighbors, name_ids=None):
+        self.names = names
+        self.name_ids = name_ids if name_ids is not None else {name: name_id for name_id, name in enumerate(names)}
+        self.offsets = offsets
+        self.neighbors = neighbors
+
+#Builds the graph from a finalized CompactInteractionStore
+#pair_keys is already sorted, so each drug's neighbors come out in id order
+    @classmethod
+    def from_store(cls, store):
+        drug_count = len(store.names)
+        pairs = []
+        previous = None
+        for key in store.pair_keys:
+            if key != previous:
+                previous = key
+                pairs.append((key >> 32, key & 0xFFFFFFFF))
+
+        degrees = array('I', bytes(4 * drug_count))
+        for id1, id2 in pairs:
+            degrees[id1] += 1
+            if id1 != id2:
+                degrees[id2] += 1
+
+        offsets = array('I', [0])
+        total = 0
+        for degree in degrees:
+            total += degree
+            offsets.append(total)
+
+        neighbors = array('I', bytes(4 * total))
+        cursor = array('I', offsets[:-1])
+        for id1, id2 in pairs:
+            neighbors[cursor[id1]] = id2
+            cursor[id1] += 1
+            if id1 != id2:
+                neighbors[cursor[id2]] = id1
+                cursor[id2] += 1
+
+        return cls(store.names, offsets, neighbors, store.name_ids)
+
+    def __len__(self):
+        return len(self.names)
+
+#Each pair is listed under both drugs, so only count it from the lower id
+    def edge_count(self):
+        offsets, neighbors = self.offsets, self.neighbors
+        return sum(1 for drug_id in range(len(self.names))
+                   for position in range(offsets[drug_id], offsets[drug_id + 1])
+                   if neighbors[position] >= drug_id)
+
+#Neighbor ids of one drug id, a slice of the adjacency array
+    def neighbor_ids(self, drug_id):
+        if drug_id == NO_DRUG or not 0 <= drug_id < len(self.names):
+            return array('I')
+        return self.neighbors[self.offsets[drug_id]:self.offsets[drug_id + 1]]
+
+#Every drug with an interaction page alongside this normalized drug name
+#Returns an empty list for unknown drugs
+    def interactions_for(self, drug):
+        drug_id = self.name_ids.get(drug)
+        if drug_id is None:
+            return []
+        names = self.names
+        return [names[neighbor] for neighbor in self.neighbor_ids(drug_id)]
+
+    def degree(self, drug):
+        drug_id = self.name_ids.get(drug)
+        if drug_id is None:
+            return 0
+        return self.offsets[drug_id + 1] - self.offsets[drug_id]
+
+    def degrees(self):
+        offsets = self.offsets
+        return array('I', (offsets[i + 1] - offsets[i] for i in range(len(self.names))))
+
+#Drug count, edge count and the spread of interactions per drug
+#Names left over from URLs a refresh removed have no interactions and aren't counted
+    def degree_stats(self):
+        degrees = sorted(degree for degree in self.degrees() if degree)
+        if not degrees:
+            return {'drugs': 0, 'edges': 0}
+        return {
+            'drugs': len(degrees),
+            'edges': self.edge_count(),
+            'min': degrees[0],
+            'median': degrees[len(degrees) // 2],
+            'mean': round(sum(degrees) / len(degrees), 2),
+            'max': degrees[-1],
+        }
+
+#The k drugs with the most interactions, as (name, degree)
+    def most_connected(self, k=10):
+        degrees = self.degrees()
+        top = sorted(range(len(degrees)), key=lambda drug_id: (-degrees[drug_id], self.names[drug_id]))[:k]
+        return [(self.names[drug_id], degrees[drug_id]) for drug_id in top]
+
+#Every pair once, as (name1, name2) with the lower id first
+    def edges(self):
+        names, offsets, neighbors = self.names, self.offsets, self.neighbors
+        for drug_id in range(len(names)):
+            for position in range(offsets[drug_id], offsets[drug_id + 1]):
+                neighbor = neighbors[position]
+                if neighbor >= drug_id:
+                    yield names[drug_id], names[neighbor]
+
+#Writes the compact binary form, loaded back with InteractionGraph.load()
+#Arrays are stored little-endian whatever machine wrote them
+    def save(self, path):
+        offsets, neighbors = array('I', self.offsets), array('I', self.neighbors)
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+            neighbors.byteswap()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(GRAPH_HEADER.pack(GRAPH_MAGIC, GRAPH_FORMAT_VERSION, len(self.names), len(self.neighbors)))
+            f.write(offsets.tobytes())
+            f.write(neighbors.tobytes())
+            f.write('\n'.join(self.names).encode('utf-8'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, drug_count, neighbor_count = GRAPH_HEADER.unpack_from(data)
+        if magic != GRAPH_MAGIC or version != GRAPH_FORMAT_VERSION:
+            raise ValueError(f"'{path}' is not an interaction graph file")
+
+        position = GRAPH_HEADER.size
+        offsets = array('I')
+        offsets.frombytes(data[position:position + 4 * (drug_count + 1)])
+        position += 4 * (drug_count + 1)
+        neighbors = array('I')
+        neighbors.frombytes(data[position:position + 4 * neighbor_count])
+        position += 4 * neighbor_count
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+            neighbors.byteswap()
+        names = data[position:].decode('utf-8').split('\n') if drug_count else []
+        return cls(names, offsets, neighbors)
+
+#Writes one tab separated pair per line, for graph tools that read edge lists
+    def save_edge_list(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for name1, name2 in self.edges():
+                f.write(f"{name1}\t{name2}\n")
+        os.replace(tmp_path, path)
+
+
+#Neighbor queries and exports from the command line
+def main():
+    arg_parser = argparse.ArgumentParser(description="Drug interaction graph built from the sitemap.")
+    arg_parser.add_argument('source', help="sitemap XML file, or a graph saved with --export")
+    arg_parser.add_argument('drugs', nargs='*', help="drugs to list the interactions of")
+    arg_parser.add_argument('--streaming', action='store_true',
+                            help="stream the sitemap, needed for .gz files and sitemap indexes")
+    arg_parser.add_argument('--stats', action='store_true', help="print degree statistics")
+    arg_parser.add_argument('--top', type=int, default=0, help="list the N drugs with the most interactions")
+    arg_parser.add_argument('--export', help="write the graph, .tsv/.txt as an edge list, anything else as binary")
+    args = arg_parser.parse_args()
+
+#Imported here because InteractionXMLParser imports this module to build its graph
+    from InteractionXMLParser import DrugInteractionParser, normalize_drug_name
+
+    start = time.perf_counter()
+    if args.source.endswith(('.xml', '.gz')):
+        parser = DrugInteractionParser(args.source, streaming=args.streaming)
+        graph = parser.graph()
+    else:
+        try:
+            graph = InteractionGraph.load(args.source)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    print(f"Loaded {len(graph)} drugs in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    for drug in args.drugs:
+        start = time.perf_counter()
+        neighbors = graph.interactions_for(normalize_drug_name(drug))
+        elapsed = time.perf_counter() - start
+        print(f"\n{drug}: {len(neighbors)} interactions ({elapsed * 1e6:.0f}us)")
+        for neighbor in neighbors:
+            print(f"  {neighbor}")
+
+    if args.stats:
+        for name, value in graph.degree_stats().items():
+            print(f"{name}: {value}")
+    if args.top:
+        for name, degree in graph.most_connected(args.top):
+            print(f"{degree:>6}  {name}")
+
+    if args.export:
+        if args.export.endswith(('.tsv', '.txt')):
+            graph.save_edge_list(args.export)
+        else:
+            graph.save(args.export)
+        print(f"Graph saved to {args.export}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#Pickle stores the compiled index in one fast-loading file
+import pickle
+#OS checks file sizes and swaps the new cache into place
+import os
+#Sys lets us access command line arguments
+import sys
+
+
+#Bump this whenever the layout of the cached data changes
+#Version 5 drops empty <loc/> entries that older indexes stored as broken rows
+INDEX_FORMAT_VERSION = 5
+
+
+#Keeps a compiled copy of the parsed sitemap next to the XML file
+#Startup loads this instead of parsing the XML again
+class InteractionIndexCache:
+    def __init__(self, xml_file_path, cache_path=None):
+        self.xml_file_path = xml_file_path
+        self.cache_path = cache_path or xml_file_path + '.idx'
+
+#Cheap signature checked on every load
+    def source_stat(self):
+        stat = os.stat(self.xml_file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+#Full content hash, only computed when the cheap signature changes
+    def source_hash(self):
+#Imported here so loading an unchanged index never pays for hashlib
+        import hashlib
+        digest = hashlib.sha256()
+        with open(self.xml_file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+#Signature of each child sitemap a sitemap index pointed to
+#A child that is missing or changed makes the cache stale
+    def child_stats(self, child_paths):
+        stats = []
+        for path in child_paths:
+            stat = os.stat(path)
+            stats.append((path, stat.st_mtime_ns, stat.st_size))
+        return stats
+
+#Returns the cached data, or None if it is missing or stale
+#mode is the loader that built the data, an index parsed one way isn't reused by the other
+#The cache only ever saves time, so a file that can't be read back for any reason counts as stale
+    def load(self, mode=None):
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cached = pickle.load(f)
+#Unpickling can raise almost anything: a renamed class, a newer protocol, a truncated file
+        except Exception:
+            return None
+
+        if not isinstance(cached, dict) or cached.get('version') != INDEX_FORMAT_VERSION:
+            return None
+
+        source = cached.get('source')
+        if (not isinstance(source, dict) or 'data' not in cached
+                or not {'mtime', 'size', 'sha256', 'mode', 'children'} <= source.keys()):
+            return None
+        if source['mode'] != mode:
+            return None
+
+        try:
+            mtime, size = self.source_stat()
+            children = self.child_stats(path for path, _, _ in source['children'])
+        except (OSError, TypeError, ValueError):
+            return None
+        if children != source['children']:
+            return None
+
+        if (mtime, size) == (source['mtime'], source['size']):
+            return cached['data']
+
+#Touched but same size, so compare hashes before throwing the cache away
+        if size == source['size'] and self.source_hash() == source['sha256']:
+            cached['source']['mtime'] = mtime
+            self.write(cached)
+            return cached['data']
+
+        return None
+
+#Saves freshly parsed data along with the signatures of the sitemap and its children
+    def save(self, data, mode=None, child_paths=()):
+        mtime, size = self.source_stat()
+        cached = {
+            'version': INDEX_FORMAT_VERSION,
+            'source': {'mtime': mtime, 'size': size, 'sha256': self.source_hash(),
+                       'mode': mode, 'children': self.child_stats(child_paths)},
+            'data': data,
+        }
+        self.write(cached)
+
+#Write to a temp file then rename so readers never see half a cache
+    def write(self, cached):
+        tmp_path = self.cache_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Warning: Could not write index cache '{self.cache_path}': {e}")
+
+#Removes the cache file so the next load parses the XML
+    def clear(self):
+        try:
+            os.remove(self.cache_path)
+        except FileNotFoundError:
+            pass
+
+
+#Rebuilds the compiled index for a sitemap
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python interactionIndexCache.py <xml_file>")
+        print("\nExample:")
+        print("  python interactionIndexCache.py drug-interactions.xml")
+        sys.exit(1)
+
+#Imported here so the parser can import this module without a cycle
+    from InteractionXMLParser import DrugInteractionParser
+
+    parser = DrugInteractionParser(sys.argv[1], rebuild_cache=True)
+    print(f"Rebuilt index cache: {parser.index_cache.cache_path}")
+
+
+if __name__ == "__main__":
+    main()
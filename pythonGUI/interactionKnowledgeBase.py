@@ -0,0 +1,238 @@
+#SQLite holds the knowledge base in one local file
+import sqlite3
+#Argparse reads the crawl options
+import argparse
+#JSON stores the list and dictionary fields of each record
+import json
+#Time stamps records and measures throughput
+import time
+#OS finds the default files next to this script
+import os
+
+from InteractionXMLParser import DrugInteractionParser
+from compactInteractionStore import URL_PREFIX
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS interactions (
+    url TEXT PRIMARY KEY,
+    drug1 TEXT,
+    drug2 TEXT,
+    severity TEXT,
+    description TEXT,
+    professional_info TEXT,
+    "references" TEXT,
+    scraped_at REAL
+);
+CREATE INDEX IF NOT EXISTS interactions_drug1 ON interactions(drug1);
+CREATE INDEX IF NOT EXISTS interactions_drug2 ON interactions(drug2);
+CREATE INDEX IF NOT EXISTS interactions_severity ON interactions(severity);
+
+CREATE TABLE IF NOT EXISTS crawl_state (
+    url TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL
+);
+'''
+
+
+#Columns read back into a scraper style record, in record_from_row() order
+RECORD_COLUMNS = 'url, drug1, drug2, severity, description, professional_info, "references"'
+
+
+#Turns an interactions row back into the scraper's dictionary
+#Fields the page didn't have are left out, like the scraper does
+def record_from_row(row):
+    record = {
+        'url': row[0],
+        'drug1': row[1],
+        'drug2': row[2],
+        'severity': row[3],
+        'description': json.loads(row[4]) if row[4] is not None else None,
+        'professional_info': json.loads(row[5]) if row[5] is not None else None,
+        'references': json.loads(row[6]) if row[6] is not None else None,
+    }
+    return {key: value for key, value in record.items() if value is not None}
+
+
+#Local SQLite store of every scraped interaction page
+#crawl_state records which URLs are finished so a crawl can stop and resume
+class InteractionKnowledgeBase:
+    def __init__(self, db_path='interactions.db'):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+#WAL lets readers query the knowledge base while a crawl is writing to it
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.stats = {'pages': 0, 'failures': 0, 'skipped': 0, 'elapsed': 0.0}
+
+#URLs scraped successfully by this or an earlier run
+    def completed_urls(self):
+        return {row[0] for row in self.connection.execute("SELECT url FROM crawl_state WHERE status = 'done'")}
+
+#URLs that failed too often to try again
+    def abandoned_urls(self, max_attempts):
+        return {row[0] for row in self.connection.execute(
+            "SELECT url FROM crawl_state WHERE status = 'failed' AND attempts >= ?", (max_attempts,))}
+
+#URLs still to scrape, in the order given
+    def pending_urls(self, urls, max_attempts=3):
+        finished = self.completed_urls() | self.abandoned_urls(max_attempts)
+        return [url for url in urls if url not in finished]
+
+#Writes one batch of records and their checkpoints in a single transaction
+#A crash mid-batch loses only that batch, never half of it
+    def save_batch(self, records, failures):
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO interactions '
+                '(url, drug1, drug2, severity, description, professional_info, "references", scraped_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(
+                    record['url'],
+                    record.get('drug1'),
+                    record.get('drug2'),
+                    record.get('severity'),
+                    self.to_json(record.get('description')),
+                    self.to_json(record.get('professional_info')),
+                    self.to_json(record.get('references')),
+                    now,
+                ) for record in records]
+            )
+            self.connection.executemany(
+                'INSERT INTO crawl_state (url, status, attempts, error, updated_at) VALUES (?, ?, 1, NULL, ?) '
+                'ON CONFLICT(url) DO UPDATE SET status = excluded.status, attempts = attempts + 1, '
+                'error = NULL, updated_at = excluded.updated_at',
+                [(record['url'], 'done', now) for record in records]
+            )
+            self.connection.executemany(
+                'INSERT INTO crawl_state (url, status, attempts, error, updated_at) VALUES (?, ?, 1, ?, ?) '
+                'ON CONFLICT(url) DO UPDATE SET status = excluded.status, attempts = attempts + 1, '
+                'error = excluded.error, updated_at = excluded.updated_at',
+                [(url, 'failed', error, now) for url, error in failures]
+            )
+
+#Scrapes every pending URL with the bulk scraper and saves them batch by batch
+#base_url sends requests to a mirror or local test server instead of drugs.com,
+#records still keep their sitemap URL
+    def crawl(self, urls, scraper, batch_size=500, base_url=None, max_attempts=3):
+        start = time.perf_counter()
+        pending = self.pending_urls(urls, max_attempts)
+        self.stats['skipped'] = len(urls) - len(pending)
+        print(f"{len(pending)} pages to scrape, {self.stats['skipped']} already done.")
+
+        for offset in range(0, len(pending), batch_size):
+            batch = pending[offset:offset + batch_size]
+            fetch_urls = {self.fetch_url(url, base_url): url for url in batch}
+
+            records = []
+            failures = []
+            results = scraper.scrape_many(fetch_urls)
+            try:
+                for fetch_url, data, error in results:
+                    url = fetch_urls[fetch_url]
+                    if error:
+                        failures.append((url, error))
+                    else:
+                        data['url'] = url
+                        records.append(data)
+            finally:
+#On Ctrl-C the rest of the batch is cancelled rather than drained, only pages already fetching are waited for
+#Keep whatever finished, the cancelled pages stay pending for the next run
+                results.close()
+                self.save_batch(records, failures)
+                self.stats['pages'] += len(records)
+                self.stats['failures'] += len(failures)
+                self.stats['elapsed'] = time.perf_counter() - start
+
+            done = offset + len(batch)
+            print(f"Checkpoint: {done}/{len(pending)} pages "
+                  f"({self.stats['failures']} failed, {self.pages_per_second():.1f} pages/s)")
+
+#Fields missing from a page are stored as NULL
+    def to_json(self, value):
+        return None if value is None else json.dumps(value, ensure_ascii=False)
+
+    def fetch_url(self, url, base_url):
+        if base_url and url.startswith(URL_PREFIX):
+            return base_url.rstrip('/') + '/' + url[len(URL_PREFIX):]
+        return url
+
+    def pages_per_second(self):
+        elapsed = self.stats['elapsed']
+        return self.stats['pages'] / elapsed if elapsed > 0 else 0.0
+
+#Reads one stored record back as the scraper's dictionary
+    def get(self, url):
+        row = self.connection.execute(
+            f'SELECT {RECORD_COLUMNS} FROM interactions WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        return record_from_row(row)
+
+#Number of URLs in each crawl state
+    def progress(self):
+        return dict(self.connection.execute('SELECT status, COUNT(*) FROM crawl_state GROUP BY status'))
+
+    def print_summary(self):
+        print("\n" + "=" * 70)
+        print("KNOWLEDGE BASE CRAWL SUMMARY")
+        print("=" * 70)
+        print(f"Pages saved this run: {self.stats['pages']}")
+        print(f"Failures this run: {self.stats['failures']}")
+        print(f"Skipped (already done): {self.stats['skipped']}")
+        print(f"Elapsed: {self.stats['elapsed']:.2f}s ({self.pages_per_second():.1f} pages/s)")
+        for status, count in sorted(self.progress().items()):
+            print(f"Total {status}: {count}")
+        print("=" * 70)
+
+    def close(self):
+        self.connection.close()
+
+
+#Crawl every sitemap URL into the knowledge base, resuming where the last run stopped
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    arg_parser = argparse.ArgumentParser(description="Build a local SQLite knowledge base of drug interactions.")
+    arg_parser.add_argument('--xml', default='drug-interactions.xml', help="sitemap XML file")
+    arg_parser.add_argument('--db', default='interactions.db', help="SQLite knowledge base file")
+    arg_parser.add_argument('--workers', type=int, default=8)
+    arg_parser.add_argument('--rate', type=float, default=2.0, help="requests per second per host")
+    arg_parser.add_argument('--batch-size', type=int, default=500, help="pages per commit and checkpoint")
+    arg_parser.add_argument('--max-attempts', type=int, default=3, help="give up on a URL after this many failures")
+    arg_parser.add_argument('--limit', type=int, help="only crawl the first N sitemap URLs")
+    arg_parser.add_argument('--base-url', help="fetch pages from this mirror instead of drugs.com")
+    arg_parser.add_argument('--offline', action='store_true', help="only use pages in the HTTP cache")
+    arg_parser.add_argument('--no-cache', action='store_true', help="don't use the HTTP cache")
+    args = arg_parser.parse_args()
+
+#Imported here so the offline query engine can use the knowledge base without requests and bs4
+    from bulkScraper import BulkScraper
+    from httpCache import HTTPCache
+
+    parser = DrugInteractionParser(args.xml, streaming=True)
+    urls = list(parser.interactions)
+    if args.limit:
+        urls = urls[:args.limit]
+
+    cache = None if args.no_cache else HTTPCache(os.path.join(script_dir, '.http_cache'), offline=args.offline)
+    scraper = BulkScraper(max_workers=args.workers, requests_per_second=args.rate, cache=cache)
+    knowledge_base = InteractionKnowledgeBase(args.db)
+
+    try:
+        knowledge_base.crawl(urls, scraper, batch_size=args.batch_size, base_url=args.base_url,
+                             max_attempts=args.max_attempts)
+    except KeyboardInterrupt:
+        print("\nCrawl stopped, run again to resume.")
+    finally:
+        scraper.close()
+        knowledge_base.print_summary()
+        knowledge_base.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#Time measures each stage with the high resolution clock
+import time
+#Threading keeps counters correct when bulk scrapers share them
+import threading
+#Functools keeps method names on timed wrappers
+import functools
+#OS reads the environment switches
+import os
+#Atexit writes the export and profiles when the program ends
+import atexit
+
+
+#Stand-in timer used while metrics are off so timed code pays almost nothing
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+#Times one run of a stage and adds it to the metrics
+class StageTimer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+#Per-stage timers and counters for the parser, scraper and cache
+#Stages can nest, e.g. index_build runs inside xml_load
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+#Stage name -> [count, total seconds, slowest seconds]
+        self.timers = {}
+        self.counters = {}
+        self.cpu_profiler = None
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.timers = {}
+            self.counters = {}
+
+#Context manager timing one stage: with metrics.timer('lookup'): ...
+    def timer(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+        return StageTimer(self, name)
+
+#Decorator timing every call of a function under a stage name
+    def timed(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                self.timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    def increment(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+#Plain dictionary copy of everything recorded so far
+    def snapshot(self):
+        with self.lock:
+            return {
+                'timers': {
+                    name: {'count': count, 'total_s': total, 'max_s': slowest,
+                           'mean_s': total / count}
+                    for name, (count, total, slowest) in self.timers.items()
+                },
+                'counters': dict(self.counters),
+            }
+
+#Prometheus text exposition format
+    def to_prometheus(self, prefix='drug_interaction'):
+        snapshot = self.snapshot()
+        lines = [
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for name, timer in sorted(snapshot['timers'].items()):
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {timer["total_s"]:.9f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {timer["count"]}')
+        lines.append(f"# TYPE {prefix}_stage_seconds_max gauge")
+        for name, timer in sorted(snapshot['timers'].items()):
+            lines.append(f'{prefix}_stage_seconds_max{{stage="{name}"}} {timer["max_s"]:.9f}')
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        return '\n'.join(lines) + '\n'
+
+#One JSON object per stage and per counter
+    def to_json_lines(self):
+#Imported here so programs that never export don't load json at startup
+        import json
+        snapshot = self.snapshot()
+        timestamp = time.time()
+        lines = []
+        for name, timer in sorted(snapshot['timers'].items()):
+            lines.append(json.dumps({'time': timestamp, 'type': 'timer', 'name': name, **timer}))
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(json.dumps({'time': timestamp, 'type': 'counter', 'name': name, 'value': value}))
+        return '\n'.join(lines) + '\n'
+
+#Writes Prometheus text for .prom files, JSON lines for anything else
+    def export(self, path):
+        text = self.to_prometheus() if path.endswith('.prom') else self.to_json_lines()
+        mode = 'w' if path.endswith('.prom') else 'a'
+        with open(path, mode, encoding='utf-8') as f:
+            f.write(text)
+
+#Starts cProfile and/or tracemalloc capture
+    def start_profiling(self, cpu=True, memory=False):
+        if cpu:
+            import cProfile
+            self.cpu_profiler = cProfile.Profile()
+            self.cpu_profiler.enable()
+        if memory:
+            import tracemalloc
+            tracemalloc.start()
+
+#Stops profiling and returns a text report of the top entries
+#The raw cProfile data is also saved if output_path is given
+    def stop_profiling(self, output_path=None, limit=25):
+        report = []
+        if self.cpu_profiler:
+            import io
+            import pstats
+            self.cpu_profiler.disable()
+            if output_path:
+                self.cpu_profiler.dump_stats(output_path)
+            stream = io.StringIO()
+            pstats.Stats(self.cpu_profiler, stream=stream).sort_stats('cumulative').print_stats(limit)
+            report.append(stream.getvalue())
+            self.cpu_profiler = None
+
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            report.append(f"Memory: current {current / 1e6:.1f}MB, peak {peak / 1e6:.1f}MB")
+            for stat in tracemalloc.take_snapshot().statistics('lineno')[:limit]:
+                report.append(str(stat))
+            tracemalloc.stop()
+        return '\n'.join(report)
+
+
+#Shared metrics used by every module, off unless switched on
+metrics = Metrics()
+
+
+#Environment switches so any CLI can be measured without code changes
+#DRUG_INTERACTION_METRICS=<file.prom|file.jsonl> enables metrics and exports at exit
+#DRUG_INTERACTION_PROFILE=cpu,memory captures cProfile/tracemalloc and prints at exit
+def configure_from_environment():
+    export_path = os.environ.get('DRUG_INTERACTION_METRICS')
+    if export_path:
+        metrics.enable()
+        atexit.register(metrics.export, export_path)
+
+    profile = os.environ.get('DRUG_INTERACTION_PROFILE')
+    if profile:
+        modes = profile.split(',')
+        metrics.start_profiling(cpu='cpu' in modes, memory='memory' in modes)
+        atexit.register(lambda: print(metrics.stop_profiling('interaction_profile.prof' if 'cpu' in modes else None)))
+
+
+configure_from_environment()
@@ -0,0 +1,137 @@
+#JSON encodes each record as one compact line
+import json
+#Threading keeps buffered writes whole when bulk workers share a writer
+import threading
+#Time decides when the buffer is old enough to flush
+import time
+#OS renames the finished file into place
+import os
+
+
+#File extensions written as MessagePack instead of JSON lines
+MSGPACK_EXTENSIONS = ('.msgpack', '.mpk')
+#File extensions RecordWriter appends records to, anything else is saved as one JSON document
+RECORD_EXTENSIONS = ('.jsonl', '.ndjson') + MSGPACK_EXTENSIONS
+
+
+#MessagePack is optional, only needed for .msgpack output
+def load_msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise ImportError("MessagePack output needs the msgpack package: pip install msgpack")
+    return msgpack
+
+
+#Streams records to a JSON lines (or MessagePack) file one record at a time
+#Records are buffered and flushed every buffer_records records, and a background
+#thread flushes anything buffered for flush_interval seconds even if no more arrive
+#
+#Overwriting writes to <path>.partial and renames it over <path> on close, so <path>
+#is never half written and the partial file can be tailed while a batch runs
+#If the writer is left by an exception the rename is skipped: <path> keeps its old
+#contents and what was written so far stays in <path>.partial
+#Appending adds whole buffered lines to the end of <path> itself
+class RecordWriter:
+    def __init__(self, path, append=False, buffer_records=100, flush_interval=1.0, msgpack_format=None):
+        self.path = path
+        self.append = append
+        self.buffer_records = buffer_records
+        self.flush_interval = flush_interval
+        if msgpack_format is None:
+            msgpack_format = path.endswith(MSGPACK_EXTENSIONS)
+        self.packer = load_msgpack().Packer() if msgpack_format else None
+
+        self.working_path = path if append else path + '.partial'
+        self.file = open(self.working_path, 'ab' if append else 'wb')
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.records_written = 0
+        self.lock = threading.Lock()
+
+        self.stopped = threading.Event()
+        self.flusher = None
+        if flush_interval:
+            self.flusher = threading.Thread(target=self.flush_periodically, daemon=True)
+            self.flusher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close(complete=exc_type is None)
+        return False
+
+#Flushes records that have waited flush_interval seconds while no new ones came in
+    def flush_periodically(self):
+        while not self.stopped.wait(self.flush_interval):
+            with self.lock:
+                if self.buffer and time.monotonic() - self.last_flush >= self.flush_interval:
+                    self.flush_locked()
+
+    def encode(self, record):
+        if self.packer:
+            return self.packer.pack(record)
+        return (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+#Adds one record, flushing if the buffer is full or has waited long enough
+    def write(self, record):
+        data = self.encode(record)
+        with self.lock:
+            self.buffer.append(data)
+            if (len(self.buffer) >= self.buffer_records
+                    or time.monotonic() - self.last_flush >= self.flush_interval):
+                self.flush_locked()
+
+#Writes everything buffered in one write, so readers only ever see whole records
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        if self.buffer:
+            self.file.write(b''.join(self.buffer))
+            self.file.flush()
+            self.records_written += len(self.buffer)
+            self.buffer = []
+        self.last_flush = time.monotonic()
+
+#Flushes the rest and moves the finished file into place
+#complete=False keeps the output in <path>.partial and leaves <path> alone
+    def close(self, complete=True):
+        if self.file.closed:
+            return
+        self.stopped.set()
+        if self.flusher:
+            self.flusher.join()
+        self.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        if complete and not self.append:
+            os.replace(self.working_path, self.path)
+
+
+#Reads records back from a JSON lines or MessagePack file
+#A last line cut off by a writer that is still running is skipped
+def read_records(path):
+    if path.endswith(MSGPACK_EXTENSIONS):
+        msgpack = load_msgpack()
+        with open(path, 'rb') as f:
+            yield from msgpack.Unpacker(f, raw=False)
+        return
+
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+#Writes one JSON document through a temp file so readers never see it half written
+def write_json_atomic(path, data, indent=2):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+    os.replace(tmp_path, path)
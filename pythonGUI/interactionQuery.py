@@ -0,0 +1,291 @@
+#SQLite answers every query from the local knowledge base
+import sqlite3
+#Argparse reads the query command line
+import argparse
+#JSON reads scraper output files and prints results
+import json
+#Time reports how long each query took
+import time
+#System provides the exit code for errors
+import sys
+
+from interactionKnowledgeBase import InteractionKnowledgeBase, RECORD_COLUMNS, record_from_row
+from InteractionXMLParser import extract_drugs_from_url, normalize_drug_name
+from interactionSeverity import severity_level
+from interactionOutput import read_records
+
+
+#Bumped when the way pages are indexed changes, so older indexes are rebuilt
+#Version 2 takes drug names from the URL instead of the page title
+SEARCH_FORMAT_VERSION = 2
+
+#Lookup indexes kept next to the knowledge base's interactions table
+#interaction_search holds normalized drug names for the drug, pair and severity indexes,
+#its id is also the rowid of the page's full-text entry
+#The drug names are in the full-text index too so a drug filter narrows the search inside FTS5
+SEARCH_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS interaction_search (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    drug1 TEXT,
+    drug2 TEXT,
+    severity TEXT,
+    scraped_at REAL
+);
+CREATE INDEX IF NOT EXISTS interaction_search_drug1 ON interaction_search(drug1, severity);
+CREATE INDEX IF NOT EXISTS interaction_search_drug2 ON interaction_search(drug2, severity);
+CREATE INDEX IF NOT EXISTS interaction_search_severity ON interaction_search(severity);
+CREATE INDEX IF NOT EXISTS interactions_scraped_at ON interactions(scraped_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS interaction_text USING fts5(
+    drugs, description, professional_info, tokenize = 'porter unicode61'
+);
+'''
+
+
+#Record columns prefixed for queries that join interactions as i
+JOINED_COLUMNS = ', '.join('i.' + column.strip() for column in RECORD_COLUMNS.split(','))
+
+
+#Drug names for the indexes, taken from the URL the way the sitemap index names them
+#Pages whose URL doesn't name two drugs fall back to the names in their title
+def indexed_drugs(url, drug1, drug2):
+    drugs = extract_drugs_from_url(url)
+    if drugs and all(drugs):
+        return drugs
+    return tuple(normalize_drug_name(drug) if drug else None for drug in (drug1, drug2))
+
+
+#Quotes text for FTS5 so hyphens and other query syntax are taken literally
+def fts_quote(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+#FTS5 query where every word must appear in the description or professional info
+#A drug limits it to that drug's pages before anything is ranked
+def fts_query(text, drug=None):
+    query = '{description professional_info} : (' + ' '.join(fts_quote(word) for word in text.split()) + ')'
+    if drug:
+        query = 'drugs : ' + fts_quote(drug) + ' AND ' + query
+    return query
+
+
+#Flattens professional_info into one searchable string
+def professional_text(professional_info):
+    if not professional_info:
+        return ''
+    return '\n'.join(str(value) for value in professional_info.values())
+
+
+#Offline queries over scraped interactions, no HTTP involved
+#Indexes drugs, severity and pairs, plus a full-text index over the page text
+class InteractionQueryEngine:
+    def __init__(self, db_path='interactions.db'):
+        self.knowledge_base = InteractionKnowledgeBase(db_path)
+        self.connection = self.knowledge_base.connection
+#The version lives in the database header, the knowledge base itself doesn't use it
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != SEARCH_FORMAT_VERSION:
+            self.connection.executescript(
+                'DROP TABLE IF EXISTS interaction_search; DROP TABLE IF EXISTS interaction_text; '
+                f'PRAGMA user_version = {SEARCH_FORMAT_VERSION};')
+        self.connection.executescript(SEARCH_SCHEMA)
+        self.update_indexes()
+
+#Adds records from scraper JSONL or MessagePack output (bulkScraper, bulkExtract) to the knowledge base
+#Returns the number of records imported
+    def import_jsonl(self, path, batch_size=1000):
+        count = 0
+        batch = []
+        for record in read_records(path):
+            if not isinstance(record, dict) or not record.get('url'):
+                continue
+            batch.append(record)
+            if len(batch) >= batch_size:
+                self.knowledge_base.save_batch(batch, [])
+                count += len(batch)
+                batch = []
+        if batch:
+            self.knowledge_base.save_batch(batch, [])
+            count += len(batch)
+
+        self.update_indexes()
+        return count
+
+#Brings the indexes up to date with pages scraped since the last update
+#Returns the number of pages indexed
+    def update_indexes(self):
+        last_indexed = self.connection.execute(
+            'SELECT COALESCE(MAX(scraped_at), 0) FROM interaction_search').fetchone()[0]
+#Pages indexed before, or indexed at this exact time already, are skipped
+        rows = self.connection.execute(
+            'SELECT i.url, i.drug1, i.drug2, i.severity, i.description, i.professional_info, i.scraped_at, s.id '
+            'FROM interactions i LEFT JOIN interaction_search s ON s.url = i.url '
+            'WHERE i.scraped_at >= ? AND (s.id IS NULL OR s.scraped_at != i.scraped_at)',
+            (last_indexed,)).fetchall()
+        if not rows:
+            return 0
+
+        drugs = [indexed_drugs(row[0], row[1], row[2]) for row in rows]
+        with self.connection:
+#Reindexed pages lose their old text first, their id is kept by the upsert
+            self.connection.executemany(
+                'DELETE FROM interaction_text WHERE rowid = ?',
+                [(row[7],) for row in rows if row[7] is not None]
+            )
+            self.connection.executemany(
+                'INSERT INTO interaction_search (url, drug1, drug2, severity, scraped_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(url) DO UPDATE SET drug1 = excluded.drug1, drug2 = excluded.drug2, '
+                'severity = excluded.severity, scraped_at = excluded.scraped_at',
+                [(url, drug1, drug2, severity, scraped_at)
+                 for (url, _, _, severity, _, _, scraped_at, _), (drug1, drug2) in zip(rows, drugs)]
+            )
+            self.connection.executemany(
+                'INSERT INTO interaction_text (rowid, drugs, description, professional_info) '
+                'SELECT id, ?, ?, ? FROM interaction_search WHERE url = ?',
+                [(' '.join(drug for drug in pair if drug),
+                  '\n'.join(json.loads(description)) if description else '',
+                  professional_text(json.loads(professional_info) if professional_info else None), url)
+                 for (url, _, _, _, description, professional_info, _, _), pair in zip(rows, drugs)]
+            )
+        return len(rows)
+
+#Records for the interactions table rows matched by a query on interaction_search
+    def records(self, where, params, limit=None):
+        sql = (f'SELECT {JOINED_COLUMNS} '
+               f'FROM interaction_search s JOIN interactions i ON i.url = s.url WHERE {where} ORDER BY s.id')
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        return [record_from_row(row) for row in self.connection.execute(sql, params)]
+
+#Every interaction involving a drug, optionally only one severity
+    def interactions_for(self, drug, severity=None, limit=None):
+        drug = normalize_drug_name(drug)
+        if severity:
+            severity = severity_level(severity)
+            return self.records('(s.drug1 = ? AND s.severity = ?) OR (s.drug2 = ? AND s.severity = ?)',
+                                (drug, severity, drug, severity), limit)
+        return self.records('s.drug1 = ? OR s.drug2 = ?', (drug, drug), limit)
+
+#The interaction pages for one pair of drugs, in either order
+    def pair(self, drug1, drug2):
+        drug1 = normalize_drug_name(drug1)
+        drug2 = normalize_drug_name(drug2)
+        return self.records('(s.drug1 = ? AND s.drug2 = ?) OR (s.drug1 = ? AND s.drug2 = ?)',
+                            (drug1, drug2, drug2, drug1))
+
+#Every interaction of one severity
+    def by_severity(self, severity, limit=None):
+        return self.records('s.severity = ?', (severity_level(severity),), limit)
+
+#Interactions whose description or professional info mention the text, best matches first
+    def search(self, text, severity=None, drug=None, limit=50):
+        if not text.split():
+            return []
+        if drug:
+            drug = normalize_drug_name(drug)
+        where = ['interaction_text MATCH ?']
+        params = [fts_query(text, drug)]
+        if severity:
+            where.append('s.severity = ?')
+            params.append(severity_level(severity))
+        if drug:
+#FTS5 matches words, so check the whole name too
+            where.append('(s.drug1 = ? OR s.drug2 = ?)')
+            params.extend([drug, drug])
+        params.append(int(limit))
+
+        rows = self.connection.execute(
+            f'SELECT {JOINED_COLUMNS} '
+            'FROM interaction_text JOIN interaction_search s ON s.id = interaction_text.rowid '
+            'JOIN interactions i ON i.url = s.url '
+            f'WHERE {" AND ".join(where)} ORDER BY interaction_text.rank LIMIT ?', params)
+        return [record_from_row(row) for row in rows]
+
+#Number of interactions of each severity, for one drug or all of them
+    def severity_counts(self, drug=None):
+        if drug:
+            drug = normalize_drug_name(drug)
+            rows = self.connection.execute(
+                'SELECT severity, COUNT(*) FROM interaction_search WHERE drug1 = ? OR drug2 = ? GROUP BY severity',
+                (drug, drug))
+        else:
+            rows = self.connection.execute('SELECT severity, COUNT(*) FROM interaction_search GROUP BY severity')
+        return {severity or 'Unknown': count for severity, count in rows}
+
+    def close(self):
+        self.knowledge_base.close()
+
+
+#Prints one line per interaction
+def print_records(records, elapsed):
+    for record in records:
+        severity = record.get('severity', 'Unknown')
+        print(f"{severity:<10} {record.get('drug1', '?')} + {record.get('drug2', '?')}  {record['url']}")
+    print(f"\n{len(records)} interactions in {elapsed * 1000:.1f}ms")
+
+
+#Query the local knowledge base from the command line
+def main():
+    arg_parser = argparse.ArgumentParser(description="Query scraped drug interactions offline.")
+    arg_parser.add_argument('--db', default='interactions.db', help="SQLite knowledge base file")
+    arg_parser.add_argument('--json', action='store_true', help="print full records as JSON")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    drug_command = commands.add_parser('drug', help="interactions for one drug")
+    drug_command.add_argument('drug')
+    drug_command.add_argument('--severity', help="Major, Moderate or Minor")
+    drug_command.add_argument('--limit', type=int)
+
+    pair_command = commands.add_parser('pair', help="interactions between two drugs")
+    pair_command.add_argument('drug1')
+    pair_command.add_argument('drug2')
+
+    severity_command = commands.add_parser('severity', help="interactions of one severity")
+    severity_command.add_argument('severity')
+    severity_command.add_argument('--limit', type=int)
+
+    search_command = commands.add_parser('search', help="full-text search of descriptions and professional info")
+    search_command.add_argument('text')
+    search_command.add_argument('--severity')
+    search_command.add_argument('--drug')
+    search_command.add_argument('--limit', type=int, default=50)
+
+    import_command = commands.add_parser('import', help="add scraper JSONL output to the knowledge base")
+    import_command.add_argument('jsonl_file')
+
+    commands.add_parser('stats', help="interaction counts by severity")
+    args = arg_parser.parse_args()
+
+    engine = InteractionQueryEngine(args.db)
+    try:
+        start = time.perf_counter()
+        if args.command == 'import':
+            print(f"Imported {engine.import_jsonl(args.jsonl_file)} records into {args.db}")
+            return
+        if args.command == 'stats':
+            print(json.dumps(engine.severity_counts(), indent=2))
+            return
+
+        if args.command == 'drug':
+            records = engine.interactions_for(args.drug, args.severity, args.limit)
+        elif args.command == 'pair':
+            records = engine.pair(args.drug1, args.drug2)
+        elif args.command == 'severity':
+            records = engine.by_severity(args.severity, args.limit)
+        else:
+            records = engine.search(args.text, args.severity, args.drug, args.limit)
+        elapsed = time.perf_counter() - start
+
+        if args.json:
+            print(json.dumps(records, indent=2, ensure_ascii=False))
+        else:
+            print_records(records, elapsed)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,50 +2,143 @@
 import requests
 #BeautifulSoup parses the raw HTML
 #Makes a navigatable tree structure to extract data
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
 #System provides access to command line arguments
 import sys
-#JSON allows to save extracted data to a JSON files
-#Needs to be edited and returned as series of strings?
-import json
 #RegEx performs string parsing for data
 import re
+#OS finds the cache directory next to this script
+import os
+#Hashlib versions the extraction rules so memoized results from older rules are ignored
+import hashlib
 
+from httpCache import HTTPCache
+from interactionMetrics import metrics
+from interactionOutput import RecordWriter, RECORD_EXTENSIONS, write_json_atomic
+from interactionSeverity import severity_level, alert_severity_level
+
+#Browser User-Agent sent with every page request
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+#Patterns are compiled once here instead of on every extract_* call
+TITLE_PATTERN = re.compile(r'(.+?)\s+and\s+(.+?)\s+(?:Interactions?|Drug)', re.IGNORECASE)
+SEVERITY_CLASSES = ['interaction-severity', 'ddc-status', 'severity']
+ALERT_CLASSES = ['alert', 'warning', 'ddc-alert']
+CONTENT_CLASS_PATTERN = re.compile(r'interaction|content|description')
+MAIN_ID_PATTERN = re.compile(r'content|main')
+PROFESSIONAL_CLASS_PATTERN = re.compile(r'professional|clinical|mechanism')
+MECHANISM_PATTERN = re.compile(r'mechanism', re.IGNORECASE)
+MANAGEMENT_PATTERN = re.compile(r'management|recommendation', re.IGNORECASE)
+REFERENCE_CLASS_PATTERN = re.compile(r'reference|citation')
+SEVERITY_PATTERNS = [{'class': severity_class} for severity_class in SEVERITY_CLASSES]
+
+#Bump when extraction code changes in a way the patterns above don't show
+EXTRACTOR_VERSION = 1
+#Part of every ExtractionCache key, editing a rule or bumping the version invalidates old entries
+EXTRACTION_RULES_VERSION = hashlib.sha256(repr((
+    EXTRACTOR_VERSION, SEVERITY_CLASSES, ALERT_CLASSES,
+    [pattern.pattern for pattern in (TITLE_PATTERN, CONTENT_CLASS_PATTERN, MAIN_ID_PATTERN,
+                                     PROFESSIONAL_CLASS_PATTERN, MECHANISM_PATTERN,
+                                     MANAGEMENT_PATTERN, REFERENCE_CLASS_PATTERN)],
+)).encode('utf-8')).hexdigest()[:16]
+
+#Keeps description paragraphs and drops navigation boilerplate
+def is_description_text(text):
+    return len(text) > 50 and not text.startswith(('Home', 'Navigate', 'Copyright'))
+
+#Innermost open tag with one of the given names, like find_parent()
+def nearest_parent(ancestors, names):
+    for tag, _ in reversed(ancestors):
+        if tag.name in names:
+            return tag
+    return None
 
 #Initializes Scraper Object and sets the HTML from the other program
 class DrugInteractionScraper:
-    def __init__(self, url):
+    def __init__(self, url, session=None, cache=None, parser='html.parser', scheduler=None,
+                 extraction_cache=None):
 
 #Sets the URL variable
 #Declares the list and 
         self.url = url
+#Optional shared requests.Session so bulk runs reuse pooled connections
+        self.session = session
+#Optional HTTPCache so unchanged pages aren't downloaded again
+        self.cache = cache
+#BeautifulSoup backend, 'lxml' is several times faster than 'html.parser'
+        self.parser = parser
+#Optional FetchScheduler shared with other scrapes, this page goes in its interactive lane
+        self.scheduler = scheduler
+#Optional ExtractionCache, pages seen before are returned without being parsed
+        self.extraction_cache = extraction_cache
+        self.extraction_key = None
         self.html_content = None
-        self.soup = None
+        self.parsed_soup = None
         self.interaction_data = {}
     
 #THis mimics a windows page in order to fetch the HTML
+    @metrics.timed('http_fetch')
     def fetch_page(self):
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
 #This fetches the raw HTML data and saves it
-            response = requests.get(self.url, headers=headers, timeout=10)
+            http = self.session or requests
+            if self.scheduler:
+                self.load_html(self.scheduler.fetch(self.url))
+            elif self.cache:
+                self.load_html(self.cache.fetch(self.url, http, headers=HEADERS, timeout=10))
+            else:
+                response = http.get(self.url, headers=HEADERS, timeout=10)
             
 #This sets a time request that will eventually time out
-            response.raise_for_status()
-            self.html_content = response.text
-            
-#Parse the data for a searchable representation of the data
-            self.soup = BeautifulSoup(self.html_content, 'html.parser')
+                response.raise_for_status()
+                metrics.increment('bytes_downloaded', len(response.content))
+                self.load_html(response.text)
             print(f" Successfully fetched: {self.url}")
             return True
 #Exception handling
         except requests.RequestException as e:
+            metrics.increment('fetch_failures')
             print(f" Error fetching URL: {e}")
             return False
 
+#Keeps the page HTML, also used for pages that were fetched somewhere else
+#Parsing waits until an extractor needs the soup, so memoized pages are never parsed
+    def load_html(self, html_content):
+        self.html_content = html_content
+        self.parsed_soup = None
+        self.extraction_key = None
+
+#Parse the data for a searchable representation of the data
+    @property
+    def soup(self):
+        if self.parsed_soup is None and self.html_content is not None:
+            with metrics.timer('html_parse'):
+                self.parsed_soup = BeautifulSoup(self.html_content, self.parser)
+        return self.parsed_soup
+
+#Stored extraction for this page's HTML, or None
+#The key covers the HTML, the extractor, the parser backend and the rule version
+    def cached_extraction(self, method):
+        if not self.extraction_cache or self.html_content is None:
+            return None
+        self.extraction_key = self.extraction_cache.key(
+            self.html_content, method, self.parser, EXTRACTION_RULES_VERSION)
+        data = self.extraction_cache.get(self.extraction_key)
+        if data is None:
+            return None
+#The same page can be served from more than one URL
+        data['url'] = self.url
+        self.interaction_data = data
+        return data
+
+    def remember_extraction(self):
+        if self.extraction_cache and self.extraction_key:
+            self.extraction_cache.put(self.extraction_key, self.interaction_data)
+
 #Parses the main element header for the names of the drugs
+    @metrics.timed('extract_drug_names')
     def extract_drug_names(self):
 
         try:
@@ -54,7 +147,7 @@ class DrugInteractionScraper:
             if title:
                 title_text = title.get_text(strip=True)
 #Parse "Drug A and Drug B Interactions"
-                match = re.search(r'(.+?)\s+and\s+(.+?)\s+(?:Interactions?|Drug)', title_text, re.IGNORECASE)
+                match = TITLE_PATTERN.search(title_text)
 #Save the data to a list
                 if match:
                     self.interaction_data['drug1'] = match.group(1).strip()
@@ -76,49 +169,35 @@ class DrugInteractionScraper:
         return False
 
 #Tests the listed danger/safetly of the interaction
+    @metrics.timed('extract_interaction_severity')
     def extract_interaction_severity(self):
 
         try:
 #There are three severity indicators (Major, Moderate, Minor)
 #Declare three array zones for data
-            severity_patterns = [
-                {'class': 'interaction-severity'},
-                {'class': 'ddc-status'},
-                {'class': 'severity'}
-            ]
-
 #Check the header for severity 
 #Use elif block to check for the level
-            for pattern in severity_patterns:
+            for pattern in SEVERITY_PATTERNS:
                 severity_elem = self.soup.find('div', pattern) or self.soup.find('span', pattern)
                 if severity_elem:
-                    severity_text = severity_elem.get_text(strip=True)
-                    # Extract severity level
-                    if 'major' in severity_text.lower():
-                        self.interaction_data['severity'] = 'Major'
-                    elif 'moderate' in severity_text.lower():
-                        self.interaction_data['severity'] = 'Moderate'
-                    elif 'minor' in severity_text.lower():
-                        self.interaction_data['severity'] = 'Minor'
-                    else:
-                        self.interaction_data['severity'] = severity_text
+                    self.interaction_data['severity'] = severity_level(severity_elem.get_text(strip=True))
                     return True
             
 #XML uses premade alert boxes that give other warnings
 #Parses data for additional alert boxes or warnings and saves the body text
-            alert = self.soup.find('div', class_=['alert', 'warning', 'ddc-alert'])
+            alert = self.soup.find('div', class_=ALERT_CLASSES)
             if alert:
-                alert_text = alert.get_text(strip=True)
-                for level in ['Major', 'Moderate', 'Minor']:
-                    if level.lower() in alert_text.lower():
-                        self.interaction_data['severity'] = level
-                        return True
+                level = alert_severity_level(alert.get_text(strip=True))
+                if level:
+                    self.interaction_data['severity'] = level
+                    return True
 #If no additional warnings then handle the exception
         except Exception as e:
             print(f"Warning: Could not extract severity: {e}")
         
         return False
 #This parses the <h1> block for how the drugs interact
+    @metrics.timed('extract_interaction_description')
     def extract_interaction_description(self):
 
 #set a list to save that data
@@ -126,14 +205,14 @@ class DrugInteractionScraper:
             descriptions = []
             
 #Extract the description paragraphs
-            content_sections = self.soup.find_all(['div', 'section'], class_=re.compile(r'interaction|content|description'))
+            content_sections = self.soup.find_all(['div', 'section'], class_=CONTENT_CLASS_PATTERN)
             
             for section in content_sections:
                 paragraphs = section.find_all('p')
                 for p in paragraphs:
                     text = p.get_text(strip=True)
 #Filter non-content paragraphs
-                    if len(text) > 50 and not text.startswith(('Home', 'Navigate', 'Copyright')):
+                    if is_description_text(text):
                         descriptions.append(text)
             
             if descriptions:
@@ -141,7 +220,7 @@ class DrugInteractionScraper:
                 return True
             
             #If data isn't found get all paragraphs from main content
-            main_content = self.soup.find(['main', 'article', 'div'], {'id': re.compile(r'content|main')})
+            main_content = self.soup.find(['main', 'article', 'div'], {'id': MAIN_ID_PATTERN})
             if main_content:
                 paragraphs = main_content.find_all('p')
                 for p in paragraphs:
@@ -159,25 +238,26 @@ class DrugInteractionScraper:
         return False
 
 #This extracts the data particular to healthcare professionals
+    @metrics.timed('extract_professional_info')
     def extract_professional_info(self):
         """Extract professional/clinical information if available."""
         try:
 #Parses paragraphs for professional terms
-            prof_section = self.soup.find(['div', 'section'], class_=re.compile(r'professional|clinical|mechanism'))
+            prof_section = self.soup.find(['div', 'section'], class_=PROFESSIONAL_CLASS_PATTERN)
             
 #If it exists, save it to a variable
             if prof_section:
                 info = {}
                 
                 # Extract mechanism of interaction
-                mechanism = prof_section.find(text=re.compile(r'mechanism', re.IGNORECASE))
+                mechanism = prof_section.find(text=MECHANISM_PATTERN)
                 if mechanism:
                     parent = mechanism.find_parent(['p', 'div'])
                     if parent:
                         info['mechanism'] = parent.get_text(strip=True)
                 
 #Extract doseage management information
-                management = prof_section.find(text=re.compile(r'management|recommendation', re.IGNORECASE))
+                management = prof_section.find(text=MANAGEMENT_PATTERN)
                 if management:
                     parent = management.find_parent(['p', 'div'])
                     if parent:
@@ -195,6 +275,7 @@ class DrugInteractionScraper:
         return False
 
 #Extracts the links and data sources in the html file
+    @metrics.timed('extract_references')
     def extract_references(self):
 
 #Save them to a list
@@ -202,7 +283,7 @@ class DrugInteractionScraper:
             references = []
             
 #Find a reference section
-            ref_section = self.soup.find(['div', 'section'], class_=re.compile(r'reference|citation'))
+            ref_section = self.soup.find(['div', 'section'], class_=REFERENCE_CLASS_PATTERN)
             
             if ref_section:
                 links = ref_section.find_all('a')
@@ -233,6 +314,14 @@ class DrugInteractionScraper:
         print("\nExtracting interaction data...")
         print("-" * 70)
         
+        return self.extract_all()
+
+#Runs every extractor on the loaded page
+#Returns a dictionary with all the key data
+    def extract_all(self):
+        if self.cached_extraction('extract_all') is not None:
+            return self.interaction_data
+
 #Prep a list for all the extracted data
         self.interaction_data['url'] = self.url
         
@@ -243,8 +332,170 @@ class DrugInteractionScraper:
         self.extract_professional_info()
         self.extract_references()
         
+        self.remember_extraction()
         return self.interaction_data
     
+#Fills in the same data as extract_all() in one walk over the page
+#Every element the five extract_* methods look for is collected on the way,
+#then the same rules pick which of them to use
+    @metrics.timed('extract_single_pass')
+    def extract_single_pass(self):
+        if self.cached_extraction('extract_single_pass') is not None:
+            return self.interaction_data
+
+        title = None
+        breadcrumb = None
+        breadcrumb_items = []
+        severity_elems = {}
+        alert = None
+        sections = []
+        main_content = None
+        main_paragraphs = []
+        prof_section = None
+#Like find(), only the first matching string counts even if it has no parent
+        mechanism_found = management_found = False
+        mechanism_parent = management_parent = None
+        ref_section = None
+        links = []
+
+#Paragraph lists of the content sections we are currently inside
+        open_sections = []
+        ancestors = []
+        inside = {'breadcrumb': False, 'main': False, 'prof': False, 'ref': False}
+
+#Depth-first walk in document order, None marks leaving a tag
+        stack = list(reversed(self.soup.contents))
+        while stack:
+            node = stack.pop()
+
+            if node is None:
+                tag, roles = ancestors.pop()
+                for role in roles:
+                    if role == 'section':
+                        open_sections.pop()
+                    else:
+                        inside[role] = False
+                continue
+
+            if not isinstance(node, Tag):
+#Strings only matter for the mechanism/management lookups
+                if inside['prof'] and not (mechanism_found and management_found):
+                    if not mechanism_found and MECHANISM_PATTERN.search(node):
+                        mechanism_found = True
+                        mechanism_parent = nearest_parent(ancestors, ('p', 'div'))
+                    if not management_found and MANAGEMENT_PATTERN.search(node):
+                        management_found = True
+                        management_parent = nearest_parent(ancestors, ('p', 'div'))
+                continue
+
+            name = node.name
+            classes = node.get('class') or []
+            roles = []
+
+            if name == 'h1' and title is None:
+                title = node
+            elif name == 'li' and inside['breadcrumb']:
+                breadcrumb_items.append(node)
+            elif name == 'p':
+                for paragraphs in open_sections:
+                    paragraphs.append(node)
+                if inside['main']:
+                    main_paragraphs.append(node)
+            elif name == 'a' and inside['ref']:
+                links.append(node)
+            elif name == 'nav' and breadcrumb is None and 'breadcrumb' in classes:
+                breadcrumb = node
+                inside['breadcrumb'] = True
+                roles.append('breadcrumb')
+
+            if name in ('div', 'span'):
+                for severity_class in SEVERITY_CLASSES:
+                    if severity_class in classes:
+                        severity_elems.setdefault((name, severity_class), node)
+                if name == 'div' and alert is None and any(c in ALERT_CLASSES for c in classes):
+                    alert = node
+
+            if name in ('div', 'section') and classes:
+                if any(CONTENT_CLASS_PATTERN.search(c) for c in classes):
+                    paragraphs = []
+                    sections.append(paragraphs)
+                    open_sections.append(paragraphs)
+                    roles.append('section')
+                if prof_section is None and any(PROFESSIONAL_CLASS_PATTERN.search(c) for c in classes):
+                    prof_section = node
+                    inside['prof'] = True
+                    roles.append('prof')
+                if ref_section is None and any(REFERENCE_CLASS_PATTERN.search(c) for c in classes):
+                    ref_section = node
+                    inside['ref'] = True
+                    roles.append('ref')
+
+            if name in ('main', 'article', 'div') and main_content is None:
+                element_id = node.get('id')
+                if element_id and MAIN_ID_PATTERN.search(element_id):
+                    main_content = node
+                    inside['main'] = True
+                    roles.append('main')
+
+            ancestors.append((node, roles))
+            stack.append(None)
+            stack.extend(reversed(node.contents))
+
+        self.interaction_data['url'] = self.url
+
+#Drug names come from the heading, else the breadcrumb
+        match = TITLE_PATTERN.search(title.get_text(strip=True)) if title else None
+        if match:
+            self.interaction_data['drug1'] = match.group(1).strip()
+            self.interaction_data['drug2'] = match.group(2).strip()
+        elif breadcrumb and len(breadcrumb_items) >= 2:
+            self.interaction_data['drug1'] = breadcrumb_items[-2].get_text(strip=True)
+            self.interaction_data['drug2'] = breadcrumb_items[-1].get_text(strip=True)
+
+#Severity badge classes are tried in order, divs before spans
+        for severity_class in SEVERITY_CLASSES:
+            severity_elem = severity_elems.get(('div', severity_class)) or severity_elems.get(('span', severity_class))
+            if severity_elem:
+                self.interaction_data['severity'] = severity_level(severity_elem.get_text(strip=True))
+                break
+        else:
+            level = alert_severity_level(alert.get_text(strip=True)) if alert else None
+            if level:
+                self.interaction_data['severity'] = level
+
+        descriptions = []
+        for paragraphs in sections:
+            for p in paragraphs:
+                text = p.get_text(strip=True)
+                if is_description_text(text):
+                    descriptions.append(text)
+        if descriptions:
+            self.interaction_data['description'] = descriptions
+        elif main_content:
+            descriptions = [text for text in (p.get_text(strip=True) for p in main_paragraphs) if len(text) > 50]
+            if descriptions:
+                self.interaction_data['description'] = descriptions[:3]
+
+        info = {}
+        if mechanism_parent:
+            info['mechanism'] = mechanism_parent.get_text(strip=True)
+        if management_parent:
+            info['management'] = management_parent.get_text(strip=True)
+        if info:
+            self.interaction_data['professional_info'] = info
+
+        references = []
+        for link in links:
+            href = link.get('href')
+            text = link.get_text(strip=True)
+            if href and text:
+                references.append({'text': text, 'url': href})
+        if references:
+            self.interaction_data['references'] = references
+
+        self.remember_extraction()
+        return self.interaction_data
+
 #Prints all the data it Returns
 #Will be removed for return function as part of I/O
     def print_summary(self):
@@ -278,6 +529,10 @@ class DrugInteractionScraper:
         
         if 'references' in self.interaction_data:
             print(f"\n References: {len(self.interaction_data['references'])} found")
+
+        if self.cache:
+            print()
+            self.cache.print_summary()
         
         print("\n" + "=" * 70)
     
@@ -292,27 +547,51 @@ class DrugInteractionScraper:
             return
 
 #This block saves all the data to a file named interation_data.json
+#Written through a temp file so the GUI never reads it half written
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(self.interaction_data, f, indent=2, ensure_ascii=False)
+            write_json_atomic(output_file, self.interaction_data)
             print(f"\n✓ Data saved to {output_file}")
         except Exception as e:
             print(f"✗ Error saving to JSON: {e}")
 
+#Appends the data as one line to a JSON lines (or .msgpack/.mpk) file
+#Unlike save_to_json, results from earlier runs are kept
+    def save_to_jsonl(self, output_file='interaction_data.jsonl'):
+        if not self.interaction_data:
+            print("No data to save.")
+            return
+
+        try:
+            with RecordWriter(output_file, append=True) as writer:
+                writer.write(self.interaction_data)
+            print(f"\n✓ Data appended to {output_file}")
+        except Exception as e:
+            print(f"✗ Error saving to {output_file}: {e}")
+
 #Run the code and test every method/function
 def main():
     #This sets the drug interaction link
     url = sys.argv[1]
     #This file will be overwritten each time for JavaScript integration
+    #A .jsonl/.ndjson/.msgpack/.mpk output file collects one record per run instead
     output_file = 'interaction_data.json'
+    if len(sys.argv) > 2 and not sys.argv[2].startswith('--'):
+        output_file = sys.argv[2]
     
+    #Pages are cached next to this script, --offline never touches the network
+    cache = HTTPCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.http_cache'),
+                      offline='--offline' in sys.argv)
+
     #Just creates scraper instance and runs extraction directly
-    scraper = DrugInteractionScraper(url)
+    scraper = DrugInteractionScraper(url, cache=cache)
     data = scraper.scrape_all()
     
     if data:
         scraper.print_summary()
-        scraper.save_to_json(output_file)
+        if output_file.endswith(RECORD_EXTENSIONS):
+            scraper.save_to_jsonl(output_file)
+        else:
+            scraper.save_to_json(output_file)
     else:
         print("Failed to scrape interaction data.")
         sys.exit(1)
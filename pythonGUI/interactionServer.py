@@ -0,0 +1,271 @@
+#Asyncio serves many GUI requests from one long-running process
+import asyncio
+#Argparse reads the server options
+import argparse
+#JSON encodes every request and response body
+import json
+#OS finds the cache directory next to this script
+import os
+#Threading runs an optional background crawl next to the server
+import threading
+#UUID gives every response its own id
+import uuid
+#URLLibrary splits the path from the query string
+from urllib.parse import urlsplit, parse_qs
+#Futures runs blocking scrapes off the event loop
+from concurrent.futures import ThreadPoolExecutor
+
+from InteractionXMLParser import DrugInteractionParser
+from interactionScraperHTML import DrugInteractionScraper
+from httpCache import HTTPCache
+from fetchScheduler import FetchScheduler
+from extractionCache import ExtractionCache
+from compactInteractionStore import URL_PREFIX
+
+
+#Reason phrases for the status codes the server sends
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error', 502: 'Bad Gateway'}
+
+#Largest request body accepted, regimens are small
+MAX_BODY_BYTES = 1024 * 1024
+#Largest k /suggest accepts, type-ahead never needs more
+MAX_SUGGESTIONS = 50
+
+
+#Raised by a handler to send an error response
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+#Keeps one DrugInteractionParser loaded and answers JSON requests
+#Replaces spawning a new process and sharing interaction_data.json per query
+class InteractionServer:
+    def __init__(self, parser, cache=None, scrape_workers=8, scheduler=None):
+        self.parser = parser
+        self.cache = cache
+#GUI scrapes use the interactive lane, so they go ahead of any crawl sharing the scheduler
+        self.scheduler = scheduler or FetchScheduler(cache=cache)
+        self.executor = ThreadPoolExecutor(max_workers=scrape_workers)
+#Repeat scrapes of a page the HTTP cache still holds skip parsing
+        self.extraction_cache = ExtractionCache(max_entries=2000)
+
+        self.routes = {
+            '/health': self.handle_health,
+            '/pair': self.handle_pair,
+            '/regimen': self.handle_regimen,
+            '/scrape': self.handle_scrape,
+            '/suggest': self.handle_suggest,
+            '/refresh': self.handle_refresh,
+        }
+#Paths that change the server's state only answer POST
+        self.post_only = {'/refresh'}
+
+    def handle_health(self, params, body):
+        return {'status': 'ok', 'entries': len(self.parser.interactions),
+                'extraction_cache_hit_rate': round(self.extraction_cache.hit_rate(), 3)}
+
+#GET /pair?drug1=warfarin&drug2=aspirin
+    def handle_pair(self, params, body):
+        drug1 = self.required(params, 'drug1')
+        drug2 = self.required(params, 'drug2')
+        urls = self.parser.check_interaction(drug1, drug2)
+        return {'drug1': drug1, 'drug2': drug2, 'interaction_found': bool(urls), 'urls': urls}
+
+#POST /regimen {"drugs": [...]} or GET /regimen?drug=a&drug=b&drug=c
+    def handle_regimen(self, params, body):
+        drugs = params.get('drug', [])
+        if body is not None:
+            drugs = body.get('drugs', []) if isinstance(body, dict) else body
+        if not isinstance(drugs, list) or len(drugs) < 2:
+            raise RequestError(400, "A regimen needs a list of at least two drugs")
+        return self.parser.check_regimen([str(drug) for drug in drugs])
+
+#GET /suggest?q=warf&k=10 for the GUI's type-ahead
+#The name index is built in the thread pool, the first call after a start or refresh reads every drug
+    async def handle_suggest(self, params, body):
+        query = self.required(params, 'q')
+        try:
+            k = int(params.get('k', ['10'])[0])
+        except ValueError:
+            raise RequestError(400, "'k' must be a number")
+        if not 1 <= k <= MAX_SUGGESTIONS:
+            raise RequestError(400, f"'k' must be between 1 and {MAX_SUGGESTIONS}")
+        loop = asyncio.get_running_loop()
+        name_index = await loop.run_in_executor(self.executor, self.parser.suggestion_index)
+        return {'query': query, 'suggestions': name_index.suggest(self.parser.normalize_drug_name(query), k)}
+
+#GET /scrape?url=... or /scrape?drug1=...&drug2=... (scrapes the first match)
+#Only interaction pages listed in the sitemap are fetched, never arbitrary URLs
+#Runs in the thread pool so lookups keep being answered while it downloads
+    async def handle_scrape(self, params, body):
+        url = params.get('url', [None])[0]
+        if url is not None:
+            if not url.startswith(URL_PREFIX) or not self.parser.is_sitemap_url(url):
+                raise RequestError(400, "Only interaction pages listed in the sitemap can be scraped")
+        else:
+            urls = self.parser.check_interaction(self.required(params, 'drug1'), self.required(params, 'drug2'))
+            if not urls:
+                raise RequestError(404, "No interaction found")
+            url = urls[0]
+
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(self.executor, self.scrape, url)
+        if data is None:
+            raise RequestError(502, f"Could not scrape {url}")
+        return data
+
+#POST /refresh re-reads the configured sitemap and picks up its changes without a restart
+#Clients can't name a file, only the sitemap the server was started with is read
+#Lookups keep using the old index until the new one is swapped in
+    async def handle_refresh(self, params, body):
+        loop = asyncio.get_running_loop()
+        summary = await loop.run_in_executor(self.executor, self.parser.refresh)
+        if summary is None:
+            raise RequestError(500, "Could not read the sitemap")
+        return summary
+
+    def scrape(self, url):
+        scraper = DrugInteractionScraper(url, scheduler=self.scheduler, extraction_cache=self.extraction_cache)
+        if not scraper.fetch_page():
+            return None
+        return scraper.extract_single_pass()
+
+    def required(self, params, name):
+        values = params.get(name)
+        if not values or not values[0].strip():
+            raise RequestError(400, f"Missing '{name}' parameter")
+        return values[0]
+
+#Reads one HTTP/1.1 request, answers it, then closes the connection
+    async def handle_connection(self, reader, writer):
+        request_id = uuid.uuid4().hex
+        try:
+            try:
+                method, target, headers, raw_body = await self.read_request(reader)
+                result = await self.dispatch(method, target, raw_body)
+                status, payload = 200, {'request_id': request_id, 'result': result}
+            except RequestError as e:
+                status, payload = e.status, {'request_id': request_id, 'error': str(e)}
+            except Exception as e:
+                status, payload = 500, {'request_id': request_id, 'error': f"{type(e).__name__}: {e}"}
+
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode('ascii') + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise RequestError(400, "Malformed request line")
+        method, target, _ = parts
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            raise RequestError(400, "Malformed Content-Length")
+        if length < 0:
+            raise RequestError(400, "Malformed Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, "Request body too large")
+        raw_body = await reader.readexactly(length) if length else b''
+        return method, target, headers, raw_body
+
+    async def dispatch(self, method, target, raw_body):
+        if method not in ('GET', 'POST'):
+            raise RequestError(405, f"Method {method} not allowed")
+
+        split = urlsplit(target)
+        handler = self.routes.get(split.path)
+        if handler is None:
+            raise RequestError(404, f"Unknown path {split.path}")
+        if split.path in self.post_only and method != 'POST':
+            raise RequestError(405, f"{split.path} only accepts POST")
+
+        params = parse_qs(split.query)
+        body = None
+        if raw_body:
+            try:
+                body = json.loads(raw_body)
+            except ValueError:
+                raise RequestError(400, "Request body is not valid JSON")
+
+        result = handler(params, body)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
+#Serves on TCP, or on a Unix socket if a path is given
+    async def serve(self, host='127.0.0.1', port=8000, unix_socket=None):
+        if unix_socket:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            print(f"Serving drug interaction lookups on unix:{unix_socket}")
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            print(f"Serving drug interaction lookups on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+#Crawls into the knowledge base through the server's scheduler, in its batch lane
+def crawl_in_background(db_path, urls, scheduler):
+#Imported here so servers that never crawl don't load sqlite3
+    from interactionKnowledgeBase import InteractionKnowledgeBase
+    from bulkScraper import BulkScraper
+
+#SQLite connections stay on the thread that made them
+    knowledge_base = InteractionKnowledgeBase(db_path)
+    try:
+        knowledge_base.crawl(urls, BulkScraper(scheduler=scheduler))
+    finally:
+        knowledge_base.close()
+
+
+#Load the sitemap once and serve lookups until stopped
+def main():
+    arg_parser = argparse.ArgumentParser(description="Long-running drug interaction lookup service.")
+    arg_parser.add_argument('--xml', default='drug-interactions.xml', help="sitemap XML file")
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8000)
+    arg_parser.add_argument('--unix-socket', help="serve on this Unix socket path instead of TCP")
+    arg_parser.add_argument('--streaming', action='store_true', help="load the sitemap with iterparse")
+    arg_parser.add_argument('--crawl-db', help="also crawl the sitemap into this knowledge base in the background")
+    args = arg_parser.parse_args()
+
+    parser = DrugInteractionParser(args.xml, streaming=args.streaming)
+    cache = HTTPCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.http_cache'))
+    scheduler = FetchScheduler(cache=cache)
+    server = InteractionServer(parser, cache=cache, scheduler=scheduler)
+
+    if args.crawl_db:
+        threading.Thread(target=crawl_in_background, args=(args.crawl_db, list(parser.interactions), scheduler),
+                         daemon=True).start()
+
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+
+
+if __name__ == "__main__":
+    main()
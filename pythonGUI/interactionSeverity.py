@@ -0,0 +1,25 @@
+#Severity levels drugs.com labels interactions with
+#Kept apart from the scraper so offline tools can read them without loading requests and bs4
+
+
+#Turns the text of a severity badge into Major, Moderate or Minor
+#Unrecognised text is kept as it is
+def severity_level(severity_text):
+    lowered = severity_text.lower()
+    if 'major' in lowered:
+        return 'Major'
+    elif 'moderate' in lowered:
+        return 'Moderate'
+    elif 'minor' in lowered:
+        return 'Minor'
+    return severity_text
+
+
+#Finds the first severity level mentioned in an alert box
+#Returns None if there isn't one
+def alert_severity_level(alert_text):
+    lowered = alert_text.lower()
+    for level in ['Major', 'Moderate', 'Minor']:
+        if level.lower() in lowered:
+            return level
+    return None
@@ -0,0 +1,79 @@
+#CSV reads medication lists one regimen per row
+import csv
+#JSON reads JSONL regimens
+import json
+#System provides access to command line arguments
+import sys
+#Time measures regimen throughput
+import time
+
+from InteractionXMLParser import DrugInteractionParser
+from interactionOutput import RecordWriter
+
+
+#Reads regimens from a CSV or JSONL file
+#Yields (regimen_id, list of drug names) for each one
+def load_regimens(input_file):
+    with open(input_file, newline='', encoding='utf-8') as f:
+        if input_file.endswith(('.jsonl', '.ndjson')):
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+#Each line is either a list of drugs or {"id": ..., "drugs": [...]}
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    yield record.get('id', line_number), record.get('drugs', [])
+                else:
+                    yield line_number, record
+        else:
+#Each CSV row is one regimen, empty cells are ignored
+            for row_number, row in enumerate(csv.reader(f), 1):
+                drugs = [cell for cell in row if cell.strip()]
+                if drugs:
+                    yield row_number, drugs
+
+
+#Checks every regimen and writes one JSON result per line
+#Returns the number of regimens checked
+def check_regimen_file(parser, input_file, output_file):
+    count = 0
+    with RecordWriter(output_file) as writer:
+        for regimen_id, drugs in load_regimens(input_file):
+            result = {'id': regimen_id}
+            result.update(parser.check_regimen(drugs))
+            writer.write(result)
+            count += 1
+    return count
+
+
+#Run batch regimen checks from the command line
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python regimenChecker.py <regimens.csv|regimens.jsonl> [output_file.jsonl] [xml_file]")
+        print("\nExample:")
+        print("  python regimenChecker.py patients.csv")
+        print("  python regimenChecker.py patients.jsonl results.jsonl drug-interactions.xml")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
+    output_file = sys.argv[2] if len(sys.argv) > 2 else 'regimen_results.jsonl'
+    xml_file = sys.argv[3] if len(sys.argv) > 3 else 'drug-interactions.xml'
+
+    parser = DrugInteractionParser(xml_file)
+
+    start = time.perf_counter()
+    try:
+        count = check_regimen_file(parser, input_file, output_file)
+    except (OSError, ValueError) as e:
+        print(f"Error reading regimens: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"Checked {count} regimens in {elapsed:.2f}s ({rate:.0f} regimens/s).")
+    print(f"Results saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main()